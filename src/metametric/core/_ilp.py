@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, fields, is_dataclass
+from functools import cache, cached_property, lru_cache
 from typing import Any, Callable, Generic, Optional, TypeVar
 from collections.abc import Collection, Iterator, Sequence
 
@@ -12,6 +13,12 @@ from metametric.core.metric import Variable
 
 T = TypeVar("T")
 
+# all ILP variables are binary indicators
+_UNIT_BOUNDS = sp.optimize.Bounds(lb=0, ub=1)
+
+# a block of constraints `A @ t <= ub`, as the sparse matrix `A` and the upper bounds `ub`
+ConstraintBlock = tuple[sp.sparse.csr_matrix, np.ndarray]
+
 
 @dataclass
 class ConstraintBuilder(ABC):
@@ -20,14 +27,8 @@ class ConstraintBuilder(ABC):
     n_x_vars: int
     n_y_vars: int
 
-    def index_pair(self, i: int, j: int) -> int:
-        return i * self.n_y + j
-
-    def index_var_pair(self, i: int, j: int) -> int:
-        return self.n_x * self.n_y + i * self.n_y_vars + j
-
     @abstractmethod
-    def build(self) -> Optional[sp.optimize.LinearConstraint]:
+    def build(self) -> Optional[ConstraintBlock]:
         pass
 
 
@@ -35,81 +36,56 @@ class ConstraintBuilder(ABC):
 class MatchingConstraintBuilder(ConstraintBuilder):
     constraint: MatchingConstraint = MatchingConstraint.ONE_TO_ONE
 
-    def build(self) -> Optional[sp.optimize.LinearConstraint]:
-        constraint_matrix_ctor: Callable[[int, int], Optional[np.ndarray]] = {
-            MatchingConstraint.ONE_TO_ONE: _get_one_to_one_constraint_matrix,
-            MatchingConstraint.ONE_TO_MANY: _get_one_to_many_constraint_matrix,
-            MatchingConstraint.MANY_TO_ONE: _get_many_to_one_constraint_matrix,
-            MatchingConstraint.MANY_TO_MANY: lambda _0, _1: None,
-        }[self.constraint]
-        m = constraint_matrix_ctor(self.n_x, self.n_y)
-        if m is not None:
-            m = np.concatenate(
-                [
-                    m,
-                    np.zeros([m.shape[0], self.n_x_vars * self.n_y_vars]),
-                ],  # pad with zeros for the latent variables
-                axis=1,
-            )
-            return sp.optimize.LinearConstraint(
-                A=m,
-                ub=np.ones([m.shape[0]]),
-            )
-        else:
+    def build(self) -> Optional[ConstraintBlock]:
+        if self.constraint is MatchingConstraint.MANY_TO_MANY:
             return None  # no constraint when the constraint is MANY_TO_MANY
+        # built at the full width, so that the columns of the latent variables are implicitly zero
+        return _assignment_block(
+            self.constraint, self.n_x, self.n_y, 0, self.n_x * self.n_y + self.n_x_vars * self.n_y_vars
+        )
 
 
 @dataclass
 class VariableMatchingConstraintBuilder(ConstraintBuilder):
-    def build(self) -> Optional[sp.optimize.LinearConstraint]:
+    def build(self) -> Optional[ConstraintBlock]:
         if self.n_x_vars == 0 or self.n_y_vars == 0:
             return None
-        # only one-to-one matching between variables
-        m = _get_one_to_one_constraint_matrix(self.n_x_vars, self.n_y_vars)
-        m = np.concatenate(
-            [
-                np.zeros([m.shape[0], self.n_x * self.n_y]),
-                m,
-            ],  # pad with zeros for the matching items
-            axis=1,
-        )
-        return sp.optimize.LinearConstraint(
-            A=m,
-            ub=np.ones([m.shape[0]]),
+        # only one-to-one matching between variables, whose columns follow those of the matching items
+        offset = self.n_x * self.n_y
+        return _assignment_block(
+            MatchingConstraint.ONE_TO_ONE, self.n_x_vars, self.n_y_vars, offset, offset + self.n_x_vars * self.n_y_vars
         )
 
 
 @dataclass
 class MonotonicityConstraintBuilder(ConstraintBuilder):
-    gram_matrix: np.ndarray  # R[n_x, n_y]
+    candidate_pairs: tuple[np.ndarray, np.ndarray]  # Z[n_pairs] each, the pairs that may be matched
     x_reachability: np.ndarray  # R[n_x, n_x]
     y_reachability: np.ndarray  # R[n_y, n_y]
 
-    def build(self) -> Optional[sp.optimize.LinearConstraint]:
-        vectors = []
-        possible_matching_pairs = [
-            (u, v) for u in range(self.n_x) for v in range(self.n_y) if self.gram_matrix[u, v] > 0
-        ]
-        for u0, v0 in possible_matching_pairs:
-            for u1, v1 in possible_matching_pairs:
-                if self.x_reachability[u0, u1] != self.y_reachability[v0, v1]:
-                    vec = np.zeros(self.n_x * self.n_y)
-                    vec[self.index_pair(u0, v0)] = 1
-                    vec[self.index_pair(u1, v1)] = 1
-                    vectors.append(vec)
-                    # Enforce monotonicity of the matching
-                    #    [u0 ~ v0] & [u1 ~ v1] -> [u0 <= u1] ≡ [v0 <= v1]
-                    # => 1 - ((1 - t[u0~v0]) + (1 - t[u1~v1])) <= 1[[u0 <= u1] ≡ [v0 <= v1]]
-                    # => t[u0~v0] + t[u1~v1] <= 1[[u0 <= u1] ≡ [v0 <= v1]] + 1
-                    # => t[u0~v0] + t[u1~v1] <= 1  (if [u0 <= u1] ≡ [v0 <= v1], constraint redundant)
-
-        if len(vectors) == 0:
+    def build(self) -> Optional[ConstraintBlock]:
+        # Enforce monotonicity of the matching
+        #    [u0 ~ v0] & [u1 ~ v1] -> [u0 <= u1] ≡ [v0 <= v1]
+        # => 1 - ((1 - t[u0~v0]) + (1 - t[u1~v1])) <= 1[[u0 <= u1] ≡ [v0 <= v1]]
+        # => t[u0~v0] + t[u1~v1] <= 1[[u0 <= u1] ≡ [v0 <= v1]] + 1
+        # => t[u0~v0] + t[u1~v1] <= 1  (if [u0 <= u1] ≡ [v0 <= v1], constraint redundant)
+        u, v = self.candidate_pairs
+        x_reachability = self.x_reachability.astype(bool, copy=False)
+        y_reachability = self.y_reachability.astype(bool, copy=False)
+        violated = x_reachability[np.ix_(u, u)] ^ y_reachability[np.ix_(v, v)]  # B[n_pairs, n_pairs]
+        # the constraint is symmetric in the two pairs, so each unordered pair of pairs is emitted once
+        violated |= violated.T
+        p0, p1 = np.nonzero(np.triu(violated, k=1))
+        n_rows = len(p0)
+        if n_rows == 0:
             return None
-        constraint_matrix = np.stack(vectors, axis=0)  # R[n_constraints, n_x * n_y]
-        return sp.optimize.LinearConstraint(
-            A=constraint_matrix,
-            ub=np.ones([constraint_matrix.shape[0]]),
-        )
+        pair_index = u * self.n_y + v
+        rows = np.repeat(np.arange(n_rows), 2)
+        cols = np.stack([pair_index[p0], pair_index[p1]], axis=1).ravel()
+        constraint_matrix = _coo_to_csr(
+            rows, cols, shape=(n_rows, self.n_x * self.n_y + self.n_x_vars * self.n_y_vars)
+        )  # R[n_constraints, n_x * n_y + n_x_vars * n_y_vars]
+        return constraint_matrix, np.ones([constraint_matrix.shape[0]])
 
 
 @dataclass
@@ -117,39 +93,37 @@ class LatentVariableConstraintBuilder(ConstraintBuilder, Generic[T]):
     x: Collection[T]
     y: Collection[T]
     cls: type[T]
-    gram_matrix: np.ndarray  # R[n_x, n_y]
+    candidate_pairs: tuple[np.ndarray, np.ndarray]  # Z[n_pairs] each, the pairs that may be matched
+    x_var_to_id: dict[Variable, int]
+    y_var_to_id: dict[Variable, int]
 
     def __post_init__(self):
         assert is_dataclass(self.cls)
 
-    def build(self) -> Optional[sp.optimize.LinearConstraint]:
-        x_vars = list(_all_variables(self.x))
-        y_vars = list(_all_variables(self.y))
-        x_var_to_id = {t: i for i, t in enumerate(x_vars)}
-        y_var_to_id = {t: j for j, t in enumerate(y_vars)}
-        vectors = []
-        for i, a in enumerate(self.x):
-            for j, b in enumerate(self.y):
-                if self.gram_matrix[i, j] > 0:
-                    for fld in fields(self.cls):  # pyright: ignore
-                        a_fld = getattr(a, fld.name, None)
-                        b_fld = getattr(b, fld.name, None)
-                        if isinstance(a_fld, Variable) and isinstance(b_fld, Variable):
-                            vec = np.zeros(self.n_x * self.n_y + self.n_x_vars * self.n_y_vars)
-                            vec[self.index_pair(i, j)] = 1
-                            vec[self.index_var_pair(x_var_to_id[a_fld], y_var_to_id[b_fld])] = -1
-                            vectors.append(vec)
-                            # Item matches implies variable matches
-                            #    [a ~ b] -> [a_fld ~ b_fld]
-                            # => t[a~b] <= t[a_fld~b_fld]
-                            # => t[a~b] - t[a_fld~b_fld] <= 0
-        if len(vectors) == 0:
+    def build(self) -> Optional[ConstraintBlock]:
+        names = _dataclass_field_names(self.cls)
+        assert names is not None  # checked in `__post_init__`
+        x_var_ids = _field_variable_ids(self.x, names, self.x_var_to_id)  # Z[n_x, n_fields], -1 where no variable
+        y_var_ids = _field_variable_ids(self.y, names, self.y_var_to_id)  # Z[n_y, n_fields], -1 where no variable
+        ii, jj = self.candidate_pairs
+        # Item matches implies variable matches, for each field holding a variable on both sides
+        #    [a ~ b] -> [a_fld ~ b_fld]
+        # => t[a~b] <= t[a_fld~b_fld]
+        # => t[a~b] - t[a_fld~b_fld] <= 0
+        a_ids, b_ids = x_var_ids[ii], y_var_ids[jj]  # Z[n_pairs, n_fields]
+        pair, k = np.nonzero((a_ids >= 0) & (b_ids >= 0))
+        n_rows = len(pair)
+        if n_rows == 0:
             return None
-        constraint_matrix = np.stack(vectors, axis=0)  # R[n_constraints, n_x * n_y + n_x_vars * n_y_vars]
-        return sp.optimize.LinearConstraint(
-            A=constraint_matrix,
-            ub=np.zeros([constraint_matrix.shape[0]]),
-        )
+        rows = np.repeat(np.arange(n_rows), 2)
+        item_cols = ii[pair] * self.n_y + jj[pair]
+        var_cols = self.n_x * self.n_y + a_ids[pair, k] * self.n_y_vars + b_ids[pair, k]
+        cols = np.stack([item_cols, var_cols], axis=1).ravel()
+        data = np.tile([1.0, -1.0], n_rows)
+        constraint_matrix = sp.sparse.csr_matrix(
+            (data, (rows, cols)), shape=(n_rows, self.n_x * self.n_y + self.n_x_vars * self.n_y_vars)
+        )  # R[n_constraints, n_x * n_y + n_x_vars * n_y_vars]
+        return constraint_matrix, np.zeros([constraint_matrix.shape[0]])
 
 
 class ILPMatchingProblem(MatchingProblem[T]):
@@ -171,8 +145,8 @@ class ILPMatchingProblem(MatchingProblem[T]):
         self.n_x = len(x)
         self.n_y = len(y)
         if has_vars:
-            self.x_vars = list(_all_variables(x))
-            self.y_vars = list(_all_variables(y))
+            self.x_vars = _unique_variables(x)
+            self.y_vars = _unique_variables(y)
             self.n_x_vars = len(self.x_vars)
             self.n_y_vars = len(self.y_vars)
         else:
@@ -180,7 +154,16 @@ class ILPMatchingProblem(MatchingProblem[T]):
             self.y_vars = []
             self.n_x_vars = 0
             self.n_y_vars = 0
-        self.constraints: list[sp.optimize.LinearConstraint] = []
+        # the variables are enumerated once, here, and their ids are shared with the constraint builders
+        self.x_var_to_id = {t: i for i, t in enumerate(self.x_vars)}
+        self.y_var_to_id = {t: j for j, t in enumerate(self.y_vars)}
+        self.constraints: list[ConstraintBlock] = []
+
+    @cached_property
+    def candidate_pairs(self) -> tuple[np.ndarray, np.ndarray]:
+        """Indices of the pairs with a positive score, the only ones worth matching, found once for all constraints."""
+        u, v = np.nonzero(self.gram_matrix > 0)
+        return u, v
 
     def add_matching_constraint(self, constraint_type: MatchingConstraint):
         constraint = MatchingConstraintBuilder(
@@ -209,7 +192,7 @@ class ILPMatchingProblem(MatchingProblem[T]):
             n_y=self.n_y,
             n_x_vars=self.n_x_vars,
             n_y_vars=self.n_y_vars,
-            gram_matrix=self.gram_matrix,
+            candidate_pairs=self.candidate_pairs,
             x_reachability=x_reachability,
             y_reachability=y_reachability,
         ).build()
@@ -225,7 +208,9 @@ class ILPMatchingProblem(MatchingProblem[T]):
             x=self.x,
             y=self.y,
             cls=cls,
-            gram_matrix=self.gram_matrix,
+            candidate_pairs=self.candidate_pairs,
+            x_var_to_id=self.x_var_to_id,
+            y_var_to_id=self.y_var_to_id,
         ).build()
         if constraint is not None:
             self.constraints.append(constraint)
@@ -243,55 +228,120 @@ class ILPMatchingProblem(MatchingProblem[T]):
         # ├─────────────────────────┴───────────────────────────┤
         # │            LATENT_VARIABLE_CONSTRAINT               │
         # ╘═════════════════════════════════════════════════════┙
-        coef = np.concatenate(
-            [
-                self.gram_matrix.reshape([self.n_x * self.n_y]),
-                np.zeros([self.n_x_vars * self.n_y_vars]),
-            ],  # pad with zeros for the latent variables
-            axis=0,
-        )
+        # milp minimizes, so the objective is the negated Gram matrix, written straight into the cost vector
+        if self.n_x_vars * self.n_y_vars == 0:
+            c = np.negative(self.gram_matrix, dtype=np.float64).ravel()
+        else:
+            c = np.zeros(self.n_x * self.n_y + self.n_x_vars * self.n_y_vars)  # zeros for the latent variables
+            np.negative(self.gram_matrix.ravel(), out=c[: self.n_x * self.n_y])
         result = sp.optimize.milp(
-            c=-coef,
-            constraints=self.constraints,
-            bounds=sp.optimize.Bounds(lb=0, ub=1),
-            integrality=np.ones_like(coef),
+            c=c,
+            constraints=_stack_constraints(self.constraints),
+            bounds=_UNIT_BOUNDS,
+            integrality=1,  # broadcast by milp: every variable is binary
         )
         solution = result.x[: self.n_x * self.n_y].reshape([self.n_x, self.n_y])
-        matching = [
-            (i, j, self.gram_matrix[i, j].item())
-            for i in range(self.n_x)
-            for j in range(self.n_y)
-            if solution[i, j] > 0
-        ]
+        ii, jj = np.nonzero(solution > 0)
+        matching = list(zip(ii.tolist(), jj.tolist(), self.gram_matrix[ii, jj].tolist()))
         return -result.fun, matching
 
 
-def _get_one_to_many_constraint_matrix(n_x: int, n_y: int) -> np.ndarray:  # [Y, X * Y]
-    mask_y = np.zeros([n_y, n_x, n_y])
-    mask_y[np.arange(n_y), :, np.arange(n_y)] = 1
-    mask_y = mask_y.reshape([n_y, n_x * n_y])
-    return mask_y
+def _stack_constraints(constraints: Sequence[ConstraintBlock]) -> Optional[sp.optimize.LinearConstraint]:
+    """Stacks all constraint blocks into a single sparse constraint, so that the solver receives one matrix."""
+    if len(constraints) == 0:
+        return None
+    return sp.optimize.LinearConstraint(
+        A=sp.sparse.vstack([a for a, _ in constraints], format="csr"),
+        ub=np.concatenate([ub for _, ub in constraints]),
+    )
+
+
+def _one_to_many_coo(n_x: int, n_y: int) -> tuple[np.ndarray, np.ndarray, int]:
+    """Row and column indices of the ones in the one-to-many constraint matrix: row $j$ covers column $j$ of $T$."""
+    rows = np.repeat(np.arange(n_y), n_x)
+    cols = np.tile(np.arange(n_x) * n_y, n_y) + rows
+    return rows, cols, n_y
+
+
+def _many_to_one_coo(n_x: int, n_y: int) -> tuple[np.ndarray, np.ndarray, int]:
+    """Row and column indices of the ones in the many-to-one constraint matrix: row $i$ covers row $i$ of $T$."""
+    return np.repeat(np.arange(n_x), n_y), np.arange(n_x * n_y), n_x
 
 
-def _get_many_to_one_constraint_matrix(n_x: int, n_y: int) -> np.ndarray:  # [X, X * Y]
-    mask_x = np.zeros([n_x, n_x, n_y])
-    mask_x[np.arange(n_x), np.arange(n_x), :] = 1
-    mask_x = mask_x.reshape([n_x, n_x * n_y])
-    return mask_x
+def _one_to_one_coo(n_x: int, n_y: int) -> tuple[np.ndarray, np.ndarray, int]:
+    """Row and column indices of the ones in the one-to-one constraint matrix: one-to-many rows, then many-to-one."""
+    rows_y, cols_y, n_rows_y = _one_to_many_coo(n_x, n_y)
+    rows_x, cols_x, n_rows_x = _many_to_one_coo(n_x, n_y)
+    return np.concatenate([rows_y, rows_x + n_rows_y]), np.concatenate([cols_y, cols_x]), n_rows_y + n_rows_x
 
 
-def _get_one_to_one_constraint_matrix(n_x: int, n_y: int) -> np.ndarray:  # [X + Y, X * Y]
-    mask_x = _get_one_to_many_constraint_matrix(n_x, n_y)
-    mask_y = _get_many_to_one_constraint_matrix(n_x, n_y)
-    return np.concatenate([mask_x, mask_y], axis=0)
+_MATCHING_COO: dict[MatchingConstraint, Callable[[int, int], tuple[np.ndarray, np.ndarray, int]]] = {
+    MatchingConstraint.ONE_TO_ONE: _one_to_one_coo,
+    MatchingConstraint.ONE_TO_MANY: _one_to_many_coo,
+    MatchingConstraint.MANY_TO_ONE: _many_to_one_coo,
+}
+
+
+@lru_cache(maxsize=128)
+def _assignment_block(constraint: MatchingConstraint, n_x: int, n_y: int, offset: int, width: int) -> ConstraintBlock:
+    """The constraint block of an assignment between `n_x` and `n_y` elements, whose indicators start at `offset`.
+
+    Blocks only depend on their shapes, so they are cached and shared between problems. They are made read-only, as
+    the solver only ever reads a copy stacked with the other blocks.
+    """
+    rows, cols, n_rows = _MATCHING_COO[constraint](n_x, n_y)
+    m = _coo_to_csr(rows, cols + offset, shape=(n_rows, width))
+    ub = np.ones([n_rows])
+    for array in (m.data, m.indices, m.indptr, ub):
+        array.flags.writeable = False
+    return m, ub
+
+
+def _coo_to_csr(rows: np.ndarray, cols: np.ndarray, shape: tuple[int, int]) -> sp.sparse.csr_matrix:
+    return sp.sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=shape)
+
+
+def _field_variable_ids(items: Collection[Any], names: Sequence[str], var_to_id: dict[Variable, int]) -> np.ndarray:
+    """For each item, the id of the variable held by each named field, or -1 if that field does not hold a variable."""
+    ids = np.full((len(items), len(names)), -1, dtype=np.intp)
+    for i, item in enumerate(items):
+        for k, name in enumerate(names):
+            value = getattr(item, name, None)
+            if isinstance(value, Variable):
+                ids[i, k] = var_to_id[value]
+    return ids
+
+
+@cache
+def _dataclass_field_names(cls: type) -> Optional[tuple[str, ...]]:
+    """The field names of a dataclass type, or `None` if it is not a dataclass."""
+    return tuple(fld.name for fld in fields(cls)) if is_dataclass(cls) else None
+
+
+def _unique_variables(obj: Any) -> list[Variable]:
+    """All distinct variables in an object, in order of first occurrence.
+
+    A variable usually occurs in many items, and each repeated occurrence would otherwise add its own row and column
+    to the variable pair block of the ILP.
+    """
+    return list(dict.fromkeys(_all_variables(obj)))
 
 
 def _all_variables(obj: Any) -> Iterator[Variable]:
-    if isinstance(obj, Variable):
-        yield obj
-    elif isinstance(obj, Collection) and not isinstance(obj, str):
-        for item in obj:
-            yield from _all_variables(item)
-    elif getattr(obj, "__dict__", None) is not None:
-        for fld in vars(obj).values():
-            yield from _all_variables(fld)
+    """All variables in an object, depth first, walked with an explicit stack rather than nested generators."""
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if type(obj) is Variable or isinstance(obj, Variable):
+            yield obj
+            continue
+        if isinstance(obj, Collection) and not isinstance(obj, str):
+            children = list(obj)
+        elif (names := _dataclass_field_names(type(obj))) is not None:
+            children = [getattr(obj, name) for name in names]
+        elif getattr(obj, "__dict__", None) is not None:
+            children = list(vars(obj).values())
+        else:
+            continue
+        children.reverse()  # so that the children are popped in order
+        stack.extend(children)
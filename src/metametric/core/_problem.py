@@ -26,31 +26,45 @@ class MatchingProblem(Generic[T]):
 
 class AssignmentProblem(MatchingProblem[T]):
     def __init__(self, x: Sequence[T], y: Sequence[T], gram_matrix: np.ndarray, constraint: MatchingConstraint):
-        super().__init__(x, y, gram_matrix)
+        # the solver and the row / column reductions all read a C-contiguous float64 matrix without copying it again
+        super().__init__(x, y, np.ascontiguousarray(gram_matrix, dtype=np.float64))
         self.constraint = constraint
 
     def solve(self) -> tuple[float, Collection[tuple[int, int, float]]]:
         m = self.gram_matrix
-        if self.constraint == MatchingConstraint.ONE_TO_ONE:
-            row_idx, col_idx = spo.linear_sum_assignment(
-                cost_matrix=m,
-                maximize=True,
-            )
-            total = m[row_idx, col_idx].sum()
-            matching = [(i.item(), j.item(), m[i, j].item()) for i, j in zip(row_idx, col_idx)]
-            return total, matching
-        if self.constraint == MatchingConstraint.ONE_TO_MANY:
-            total = m.max(axis=0).sum().item()
+        if self.constraint is MatchingConstraint.ONE_TO_ONE:
+            row_idx, col_idx = _max_weight_assignment(m)
+            scores = m[row_idx, col_idx]
+            # converted to Python scalars in bulk rather than with one `.item()` call per entry
+            matching = list(zip(row_idx.tolist(), col_idx.tolist(), scores.tolist()))
+            return scores.sum().item(), matching
+        if self.constraint is MatchingConstraint.ONE_TO_MANY:
             selected_x = m.argmax(axis=0)
-            matching = [(selected_x[j].item(), j, m[selected_x[j], j].item()) for j in range(m.shape[1])]
-            return total, matching
-        if self.constraint == MatchingConstraint.MANY_TO_ONE:
-            total = m.max(axis=1).sum().item()
+            cols = np.arange(m.shape[1])
+            scores = m[selected_x, cols]
+            return scores.sum().item(), list(zip(selected_x.tolist(), cols.tolist(), scores.tolist()))
+        if self.constraint is MatchingConstraint.MANY_TO_ONE:
+            rows = np.arange(m.shape[0])
             selected_y = m.argmax(axis=1)
-            matching = [(i, selected_y[i].item(), m[i, selected_y[i]].item()) for i in range(m.shape[0])]
-            return total, matching
-        if self.constraint == MatchingConstraint.MANY_TO_MANY:
-            total = m.sum().item()
-            matching = [(i, j, m[i, j].item()) for i in range(m.shape[0]) for j in range(m.shape[1])]
-            return total, matching
+            scores = m[rows, selected_y]
+            return scores.sum().item(), list(zip(rows.tolist(), selected_y.tolist(), scores.tolist()))
+        if self.constraint is MatchingConstraint.MANY_TO_MANY:
+            # every pair is matched, but only the pairs with a nonzero score are worth reporting
+            ii, jj = np.nonzero(m)
+            matching = list(zip(ii.tolist(), jj.tolist(), m[ii, jj].tolist()))
+            return m.sum().item(), matching
         raise ValueError(f"Invalid constraint: {self.constraint}")
+
+
+def _max_weight_assignment(m: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Solves the maximum-weight one-to-one assignment on a Gram matrix.
+
+    When one side has a single element the optimum is just the best entry, so it is found by `argmax` without calling
+    the solver. Otherwise this defers to SciPy's native (LAPJV-based) `linear_sum_assignment`.
+    """
+    n_x, n_y = m.shape
+    if n_x == 1:
+        return np.zeros(1, dtype=np.intp), np.array([m[0].argmax()])
+    if n_y == 1:
+        return np.array([m[:, 0].argmax()]), np.zeros(1, dtype=np.intp)
+    return spo.linear_sum_assignment(cost_matrix=m, maximize=True)
@@ -0,0 +1,118 @@
+r"""Dynamic programming kernels for sequence matching.
+
+Each kernel takes a Gram matrix $G \in \mathbb{R}^{n_x \times n_y}$ and returns the optimal score of a monotonic
+matching under one matching constraint. The constraint is fixed per kernel so that no branch on it is taken inside
+the $O(n_x n_y)$ loop, and the DP table takes the dtype of $G$. If `numba` is installed, the kernels are
+JIT-compiled; otherwise they run as plain Python.
+"""
+
+from typing import Callable
+
+import numpy as np
+
+from metametric.core.constraint import MatchingConstraint
+
+try:
+    from numba import njit  # pyright: ignore[reportMissingImports]
+
+    _jit = njit(cache=True, fastmath=True, boundscheck=False)
+except ImportError:  # numba is an optional accelerator
+
+    def _jit(f):
+        return f
+
+
+@_jit
+def _one_to_one(m: np.ndarray) -> float:
+    n_x, n_y = m.shape
+    f = np.zeros((n_x + 1, n_y + 1), dtype=m.dtype)
+    for i in range(1, n_x + 1):
+        f_prev, f_cur, m_row = f[i - 1], f[i], m[i - 1]
+        diag = left = 0.0
+        for j in range(1, n_y + 1):
+            up = f_prev[j]
+            g = m_row[j - 1]
+            v = diag + g
+            if up > v:
+                v = up
+            if left > v:
+                v = left
+            f_cur[j] = v
+            diag, left = up, v
+    return f[n_x, n_y]
+
+
+@_jit
+def _one_to_many(m: np.ndarray) -> float:
+    n_x, n_y = m.shape
+    f = np.zeros((n_x + 1, n_y + 1), dtype=m.dtype)
+    for i in range(1, n_x + 1):
+        f_prev, f_cur, m_row = f[i - 1], f[i], m[i - 1]
+        diag = left = 0.0
+        for j in range(1, n_y + 1):
+            up = f_prev[j]
+            g = m_row[j - 1]
+            v = diag + g
+            if up > v:
+                v = up
+            if left > v:
+                v = left
+            if left + g > v:
+                v = left + g
+            f_cur[j] = v
+            diag, left = up, v
+    return f[n_x, n_y]
+
+
+@_jit
+def _many_to_one(m: np.ndarray) -> float:
+    n_x, n_y = m.shape
+    f = np.zeros((n_x + 1, n_y + 1), dtype=m.dtype)
+    for i in range(1, n_x + 1):
+        f_prev, f_cur, m_row = f[i - 1], f[i], m[i - 1]
+        diag = left = 0.0
+        for j in range(1, n_y + 1):
+            up = f_prev[j]
+            g = m_row[j - 1]
+            v = diag + g
+            if up > v:
+                v = up
+            if left > v:
+                v = left
+            if up + g > v:
+                v = up + g
+            f_cur[j] = v
+            diag, left = up, v
+    return f[n_x, n_y]
+
+
+@_jit
+def _many_to_many(m: np.ndarray) -> float:
+    n_x, n_y = m.shape
+    f = np.zeros((n_x + 1, n_y + 1), dtype=m.dtype)
+    for i in range(1, n_x + 1):
+        f_prev, f_cur, m_row = f[i - 1], f[i], m[i - 1]
+        diag = left = 0.0
+        for j in range(1, n_y + 1):
+            up = f_prev[j]
+            g = m_row[j - 1]
+            v = diag + g
+            if up > v:
+                v = up
+            if left > v:
+                v = left
+            if left + g > v:
+                v = left + g
+            if up + g > v:
+                v = up + g
+            f_cur[j] = v
+            diag, left = up, v
+    return f[n_x, n_y]
+
+
+KERNELS: dict[MatchingConstraint, Callable[[np.ndarray], float]] = {
+    MatchingConstraint.ONE_TO_ONE: _one_to_one,
+    MatchingConstraint.ONE_TO_MANY: _one_to_many,
+    MatchingConstraint.MANY_TO_ONE: _many_to_one,
+    MatchingConstraint.MANY_TO_MANY: _many_to_many,
+}
@@ -13,13 +13,16 @@ class MatchingConstraint(Enum):
 
     @staticmethod
     def from_str(s: str) -> "MatchingConstraint":
-        return {
-            "<->": MatchingConstraint.ONE_TO_ONE,
-            "<-": MatchingConstraint.ONE_TO_MANY,
-            "->": MatchingConstraint.MANY_TO_ONE,
-            "~": MatchingConstraint.MANY_TO_MANY,
-            "1:1": MatchingConstraint.ONE_TO_ONE,
-            "1:*": MatchingConstraint.ONE_TO_MANY,
-            "*:1": MatchingConstraint.MANY_TO_ONE,
-            "*:*": MatchingConstraint.MANY_TO_MANY,
-        }[s]
+        return _STR_TO_CONSTRAINT[s]
+
+
+_STR_TO_CONSTRAINT = {
+    "<->": MatchingConstraint.ONE_TO_ONE,
+    "<-": MatchingConstraint.ONE_TO_MANY,
+    "->": MatchingConstraint.MANY_TO_ONE,
+    "~": MatchingConstraint.MANY_TO_MANY,
+    "1:1": MatchingConstraint.ONE_TO_ONE,
+    "1:*": MatchingConstraint.ONE_TO_MANY,
+    "*:1": MatchingConstraint.MANY_TO_ONE,
+    "*:*": MatchingConstraint.MANY_TO_MANY,
+}
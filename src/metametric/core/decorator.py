@@ -1,6 +1,7 @@
 """Decorator for deriving metrics from dataclasses."""
 
 from dataclasses import fields, is_dataclass
+from functools import cache, lru_cache
 from typing import Annotated, Any, Callable, Literal, TypeVar, Union, get_args, get_origin, Optional, cast
 from collections.abc import Collection
 
@@ -24,6 +25,13 @@ T = TypeVar("T", contravariant=True)
 
 def may_be_variable(cls: Any) -> bool:
     """Check if a type may be a `Variable`."""
+    try:
+        return _may_be_variable_cached(cls)
+    except TypeError:  # unhashable type annotation
+        return _may_be_variable(cls)
+
+
+def _may_be_variable(cls: Any) -> bool:
     if cls is Variable:
         return True
     if get_origin(cls) is not None and get_origin(cls) is Union:
@@ -32,8 +40,18 @@ def may_be_variable(cls: Any) -> bool:
     return False
 
 
+_may_be_variable_cached = cache(_may_be_variable)
+
+
 def dataclass_has_variable(cls: type) -> bool:
-    """Check if a dataclass has a field with `Variable` in its type signature."""
+    """Check if a dataclass has a field with `Variable` in its type signature.
+
+    Classes decorated with `metametric` record the answer in their own `__metametric_has_variable__` attribute, which
+    is read instead of walking their fields again.
+    """
+    has_variable = getattr(cls, "__dict__", {}).get("__metametric_has_variable__")  # not inherited by subclasses
+    if has_variable is not None:
+        return has_variable
     if cls is Variable:
         return True
     if is_dataclass(cls):
@@ -62,12 +80,23 @@ def derive_metric(cls: type[T], constraint: MatchingConstraint) -> Metric[T]:
     if isinstance(cls, HasMetric):
         return cls.metric
 
-    cls_origin = get_origin(cls)
     if isinstance(cls, HasLatentMetric):
         return cls.latent_metric
 
+    # explicit metrics are looked up above on every call, so that classes decorated later are never shadowed
+    try:
+        hash((cls, constraint))
+    except TypeError:  # unhashable type annotation
+        return _derive_structural_metric(cls, constraint)
+    return _derive_structural_metric_cached(cls, constraint)
+
+
+def _derive_structural_metric(cls: type[T], constraint: MatchingConstraint) -> Metric[T]:
+    """Derive a metric from the structure of a type that does not define its own metric."""
+    cls_origin = get_origin(cls)
+
     # derive product metric from dataclass
-    elif is_dataclass(cls):
+    if is_dataclass(cls):
         return ProductMetric(
             cls=cls,
             field_metrics={
@@ -108,6 +137,9 @@ def derive_metric(cls: type[T], constraint: MatchingConstraint) -> Metric[T]:
         raise ValueError(f"Could not derive metric from type {cls}.")
 
 
+_derive_structural_metric_cached = lru_cache(maxsize=None)(_derive_structural_metric)
+
+
 def metametric(
     cls: Optional[type] = None,
     /,
@@ -142,7 +174,9 @@ def metametric(
                 normalizer_obj = Normalizer.from_str(normalizer)
                 assert normalizer_obj is not None
                 normalized_metric = NormalizedMetric(metric, normalizer=normalizer_obj)
-        if dataclass_has_variable(cls):
+        has_variable = dataclass_has_variable(cls)
+        setattr(cls, "__metametric_has_variable__", has_variable)
+        if has_variable:
             setattr(cls, "latent_metric", normalized_metric)  # type: ignore
         else:
             setattr(cls, "metric", normalized_metric)  # type: ignore
@@ -1,6 +1,7 @@
 """Define a `Graph` protocol that `networkx.DiGraph` satisfies."""
 
 from typing import Protocol, TypeVar, runtime_checkable
+from weakref import WeakKeyDictionary
 from collections.abc import Collection, Iterator
 
 import numpy as np
@@ -36,11 +37,32 @@ def _adjacency_matrix(graph: Graph) -> np.ndarray:
 
 
 def _reachability_matrix(graph: Graph) -> np.ndarray:
-    """Get the reachability matrix of a graph."""
+    """Get the reachability matrix of a graph.
+
+    Results are cached per graph object together with the adjacency matrix they were computed from, so a graph that
+    is scored against many others only has its transitive closure computed once, and a graph mutated in between is
+    recomputed.
+    """
     a = _adjacency_matrix(graph)
+    try:
+        cached = _REACHABILITY_CACHE.get(graph)
+    except TypeError:  # graphs that cannot be weakly referenced are not cached
+        return _transitive_closure(a)
+    if cached is not None and np.array_equal(cached[0], a):
+        return cached[1]
+    c = _transitive_closure(a)
+    _REACHABILITY_CACHE[graph] = (a, c)
+    return c
+
+
+def _transitive_closure(a: np.ndarray) -> np.ndarray:
+    """Get the reflexive transitive closure of an adjacency matrix by repeated squaring."""
     b = np.eye(a.shape[0], dtype=bool) + a
     c = b @ b
     while not np.all(c == b):
         b = c
         c = b @ b
     return c
+
+
+_REACHABILITY_CACHE: "WeakKeyDictionary[Graph, tuple[np.ndarray, np.ndarray]]" = WeakKeyDictionary()
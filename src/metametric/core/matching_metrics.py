@@ -2,22 +2,26 @@
 
 from dataclasses import is_dataclass
 from typing import TypeVar, Union
-from collections.abc import Collection, Sequence
-from collections import defaultdict
+from collections.abc import Collection, Hashable, Iterable, Sequence
+from collections import Counter, defaultdict
 
 import numpy as np
 
 from metametric.core._ilp import ILPMatchingProblem
+from metametric.core._sequence import KERNELS
 from metametric.core.constraint import MatchingConstraint
 from metametric.core.graph import Graph, _reachability_matrix
 from metametric.core.matching import Match, Matching, Path
-from metametric.core.metric import DiscreteMetric, Metric
+from metametric.core.metric import DiscreteMetric, Metric, _compares_by_equality, _equality_keys
 from metametric.core._problem import AssignmentProblem
 
 
 C = TypeVar("C")
 T = TypeVar("T")
 
+# swapping x and y swaps ONE_TO_MANY with MANY_TO_ONE, so only these constraints preserve symmetry
+_SYMMETRIC_CONSTRAINTS = (MatchingConstraint.ONE_TO_ONE, MatchingConstraint.MANY_TO_MANY)
+
 
 def _matching_from_triples(
     original_x: C,
@@ -25,7 +29,7 @@ def _matching_from_triples(
     score: float,
     x: Sequence[T],
     y: Sequence[T],
-    matches: Collection[tuple[int, int, float]],
+    matches: Iterable[tuple[int, int, float]],
 ) -> Matching:
     def _matching():
         yield Match(Path(), original_x, Path(), original_y, score)
@@ -35,6 +39,32 @@ def _matching_from_triples(
     return Matching(_matching())
 
 
+def _as_sequence(xs: Collection[T]) -> Sequence[T]:
+    """Returns lists and tuples as they are, and copies any other collection into a list."""
+    return xs if isinstance(xs, (list, tuple)) else list(xs)
+
+
+def _first_indices(xs: Sequence[T]) -> dict[T, int]:
+    """Maps each distinct element to the index of its first occurrence, as `argmax` over a 0/1 Gram matrix would."""
+    indices: dict[T, int] = {}
+    for i, u in enumerate(xs):
+        indices.setdefault(u, i)
+    return indices
+
+
+def _one_to_one_common(inner: Metric[T], kx: Sequence[Hashable], ky: Sequence[Hashable]) -> tuple[Counter, float]:
+    """Counts how many elements with each common key are matched one-to-one, and their total score.
+
+    Equal elements are paired up, so each key is matched as often as it occurs on the side where it is rarer.
+    `DiscreteMetric` keeps its set semantics, under which each common key is matched once.
+    """
+    x_counts, y_counts = Counter(kx), Counter(ky)
+    common = x_counts & y_counts
+    if isinstance(inner, DiscreteMetric):
+        return common, float(len(common))
+    return common, float(sum(common.values()))
+
+
 class SetMatchingMetric(Metric[Collection[T]]):
     """A metric derived from the matching of two sets."""
 
@@ -45,76 +75,181 @@ class SetMatchingMetric(Metric[Collection[T]]):
     def compute(self, x: Collection[T], y: Collection[T]) -> tuple[float, Matching]:
         """Score two sets of objects."""
         original_x, original_y = x, y
-        x, y = list(x), list(y)
+        x, y = _as_sequence(x), _as_sequence(y)
         x_is_empty = len(x) == 0
         y_is_empty = len(y) == 0
         if x_is_empty and y_is_empty:
             return 1.0, Matching([Match(Path(), x, Path(), y, 1.0)])
         elif x_is_empty or y_is_empty:
             return 0.0, Matching([])
-        elif isinstance(self.inner, DiscreteMetric) and self.constraint == MatchingConstraint.ONE_TO_ONE:
-            intersection = set(x) & set(y)
-            score = len(intersection)
+        # metrics that only compare by equality are matched by hashing instead of solving over a Gram matrix
+        kx = _equality_keys(self.inner, x)
+        if kx is not None:
+            try:
+                ky = _equality_keys(self.inner, y)
+                return self._compute_by_equality(original_x, original_y, x, y, kx, ky)  # type: ignore[arg-type]
+            except TypeError:  # unhashable elements
+                pass
+        m = self.inner.gram_matrix(x, y)
+        score, triples = AssignmentProblem(x, y, m, self.constraint).solve()
+        return score, _matching_from_triples(original_x, original_y, score, x, y, triples)
+
+    def _compute_by_equality(
+        self,
+        original_x: Collection[T],
+        original_y: Collection[T],
+        x: Sequence[T],
+        y: Sequence[T],
+        kx: Sequence[Hashable],
+        ky: Sequence[Hashable],
+    ) -> tuple[float, Matching]:
+        """Score two sets of objects whose elements match iff their keys `kx` and `ky` are equal."""
+        if self.constraint is MatchingConstraint.ONE_TO_ONE:
+            common, score = _one_to_one_common(self.inner, kx, ky)
 
             def _matching():
                 yield Match(Path(), x, Path(), y, score)
                 x_indices, y_indices = defaultdict(list), defaultdict(list)
-                for i, u in enumerate(x):
+                for i, u in enumerate(kx):
                     x_indices[u].append(i)
-                for j, v in enumerate(y):
+                for j, v in enumerate(ky):
                     y_indices[v].append(j)
-                for k in intersection:
+                for k in common:
                     for i, j in zip(x_indices[k], y_indices[k]):
                         yield Match(Path().prepend(i), x[i], Path().prepend(j), y[j], 1.0)
 
             return score, Matching(_matching())
-        else:
-            m = self.inner.gram_matrix(x, y)
-            score, triples = AssignmentProblem(x, y, m, self.constraint).solve()
+        elif self.constraint is MatchingConstraint.ONE_TO_MANY:
+            # the Gram matrix is 0/1, so each element in y is matched iff it occurs in x
+            x_indices = _first_indices(kx)
+            triples = [(x_indices[v], j, 1.0) for j, v in enumerate(ky) if v in x_indices]
+            score = float(len(triples))
             return score, _matching_from_triples(original_x, original_y, score, x, y, triples)
+        elif self.constraint is MatchingConstraint.MANY_TO_ONE:
+            y_indices = _first_indices(ky)
+            triples = [(i, y_indices[u], 1.0) for i, u in enumerate(kx) if u in y_indices]
+            score = float(len(triples))
+            return score, _matching_from_triples(original_x, original_y, score, x, y, triples)
+        elif self.constraint is MatchingConstraint.MANY_TO_MANY:
+            # every pair of equal elements is matched, so only the counts of the common elements matter
+            x_counts, y_counts = Counter(kx), Counter(ky)
+            common = x_counts.keys() & y_counts.keys()
+            score = float(sum(x_counts[k] * y_counts[k] for k in common))
+
+            def _triples():
+                y_indices = defaultdict(list)
+                for j, v in enumerate(ky):
+                    if v in common:
+                        y_indices[v].append(j)
+                for i, u in enumerate(kx):
+                    for j in y_indices.get(u, ()):
+                        yield i, j, 1.0
+
+            return score, _matching_from_triples(original_x, original_y, score, x, y, _triples())
+        raise ValueError(f"Invalid constraint: {self.constraint}")
 
     def score_self(self, x: Collection[T]) -> float:
         """Score a set of objects with itself."""
-        x = list(x)
+        x = _as_sequence(x)
         if len(x) == 0:
             return 1.0
-        elif self.constraint == MatchingConstraint.MANY_TO_MANY:
-            return self.inner.gram_matrix(x, x).sum()
-        elif self.constraint == MatchingConstraint.ONE_TO_ONE:
-            return sum(self.inner.score_self(u) for u in x)
+        kx = _equality_keys(self.inner, x)
+        if kx is not None and self.constraint is MatchingConstraint.MANY_TO_MANY:
+            try:
+                return float(sum(c * c for c in Counter(kx).values()))
+            except TypeError:  # unhashable elements
+                pass
+        elif kx is not None:
+            return float(len(x))  # every element is matched to an equal copy of itself
+        if self.constraint is MatchingConstraint.MANY_TO_MANY:
+            return float(self.inner.gram_matrix_self(x).sum())
+        elif self.constraint is MatchingConstraint.ONE_TO_ONE:
+            return float(self.inner.score_self_batch(x).sum())
         else:
-            return self.score(x, x)
+            # the same reductions as `AssignmentProblem`, without building the matching
+            axis = 0 if self.constraint is MatchingConstraint.ONE_TO_MANY else 1
+            return float(self.inner.gram_matrix_self(x).max(axis=axis).sum())
+
+    def score_triplet(self, x: Collection[T], y: Collection[T]) -> tuple[float, float, float]:
+        """Score two sets of objects together with their self scores, hashing each set only once."""
+        if self.constraint is not MatchingConstraint.ONE_TO_ONE:
+            return super().score_triplet(x, y)
+        x, y = _as_sequence(x), _as_sequence(y)
+        kx = _equality_keys(self.inner, x)
+        if kx is None:
+            return super().score_triplet(x, y)
+        try:
+            _, sxy = _one_to_one_common(self.inner, kx, _equality_keys(self.inner, y))  # type: ignore[arg-type]
+        except TypeError:  # unhashable elements
+            return super().score_triplet(x, y)
+        sxx = float(len(x)) if x else 1.0
+        syy = float(len(y)) if y else 1.0
+        if not x and not y:
+            sxy = 1.0
+        return sxx, syy, sxy
+
+    def score_batch(
+        self, xs: Sequence[Collection[T]], ys: Sequence[Collection[T]]
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Score a batch of pairs of sets, together with their self scores."""
+        if not (_compares_by_equality(self.inner) and self.constraint is MatchingConstraint.ONE_TO_ONE):
+            return super().score_batch(xs, ys)
+        n = len(xs)
+        sxx, syy, sxy = np.empty(n), np.empty(n), np.empty(n)
+        for k, (x, y) in enumerate(zip(xs, ys)):
+            sxx[k], syy[k], sxy[k] = self.score_triplet(x, y)
+        return sxx, syy, sxy
+
+    @property
+    def symmetric(self) -> bool:
+        return self.inner.symmetric and self.constraint in _SYMMETRIC_CONSTRAINTS
+
+    @property
+    def deterministic(self) -> bool:
+        return self.inner.deterministic
 
 
 class SequenceMatchingMetric(Metric[Sequence[T]]):
-    """A metric derived from the matching of two sequences."""
+    """A metric derived from the matching of two sequences.
 
-    def __init__(self, inner: Metric[T], constraint: Union[str, MatchingConstraint] = MatchingConstraint.ONE_TO_ONE):
+    Args:
+        inner: The metric for the elements of the sequences.
+        constraint: The matching constraint.
+        dtype: The floating point type of the dynamic programming table. `np.float32` halves its memory traffic
+            at the cost of precision: integer scores are only exact up to $2^{24}$.
+    """
+
+    def __init__(
+        self,
+        inner: Metric[T],
+        constraint: Union[str, MatchingConstraint] = MatchingConstraint.ONE_TO_ONE,
+        dtype: type = np.float64,
+    ):
         self.inner = inner
+        if not np.issubdtype(dtype, np.floating):
+            raise ValueError(f"The dynamic programming table needs a floating point dtype, got {dtype}.")
         self.constraint = MatchingConstraint.from_str(constraint) if isinstance(constraint, str) else constraint
+        self.dtype = dtype
 
     def compute(self, x: Sequence[T], y: Sequence[T]) -> tuple[float, Matching]:
-        m = self.inner.gram_matrix(x, y)
-        f = np.zeros([m.shape[0] + 1, m.shape[1] + 1])
-        for i in range(m.shape[0] + 1):
-            for j in range(m.shape[1] + 1):
-                if i == 0 or j == 0:
-                    f[i, j] = 0
-                else:
-                    f[i, j] = max(f[i - 1, j - 1] + m[i - 1, j - 1], f[i - 1, j], f[i, j - 1])
-                    if self.constraint == MatchingConstraint.ONE_TO_MANY:
-                        f[i, j] = max(f[i, j], f[i, j - 1] + m[i - 1, j - 1])
-                    elif self.constraint == MatchingConstraint.MANY_TO_ONE:
-                        f[i, j] = max(f[i, j], f[i - 1, j] + m[i - 1, j - 1])
-                    elif self.constraint == MatchingConstraint.MANY_TO_MANY:
-                        f[i, j] = max(f[i, j], f[i, j - 1] + m[i - 1, j - 1], f[i - 1, j] + m[i - 1, j - 1])
-        return f[-1, -1].item(), Matching([])  # TODO: implement matching
+        m = np.ascontiguousarray(self.inner.gram_matrix(x, y), dtype=self.dtype)
+        score = KERNELS[self.constraint](m)
+        return float(score), Matching([])  # TODO: implement matching
 
     def score_self(self, x: Sequence[T]) -> float:
-        if self.constraint == MatchingConstraint.ONE_TO_ONE:
-            return sum(self.inner.score_self(u) for u in x)
+        if self.constraint is MatchingConstraint.ONE_TO_ONE:
+            return float(self.inner.score_self_batch(x).sum())
         else:
-            return self.score(x, x)
+            m = np.ascontiguousarray(self.inner.gram_matrix_self(x), dtype=self.dtype)
+            return float(KERNELS[self.constraint](m))
+
+    @property
+    def symmetric(self) -> bool:
+        return self.inner.symmetric and self.constraint in _SYMMETRIC_CONSTRAINTS
+
+    @property
+    def deterministic(self) -> bool:
+        return self.inner.deterministic
 
 
 class GraphMatchingMetric(Metric[Graph[T]]):
@@ -137,6 +272,22 @@ class GraphMatchingMetric(Metric[Graph[T]]):
         score, matches = problem.solve()
         return score, _matching_from_triples(x, y, score, x_nodes, y_nodes, matches)
 
+    def score_self(self, x: Graph[T]) -> float:
+        """Score a graph with itself, computing its reachability matrix only once."""
+        x_nodes = list(x.nodes())
+        gram_matrix = self.inner.gram_matrix_self(x_nodes)
+        x_reach = _reachability_matrix(x)
+
+        problem = ILPMatchingProblem(x_nodes, x_nodes, gram_matrix, has_vars=False)
+        problem.add_matching_constraint(self.constraint)
+        problem.add_monotonicity_constraint(x_reach, x_reach)
+        score, _ = problem.solve()
+        return score
+
+    @property
+    def deterministic(self) -> bool:
+        return self.inner.deterministic
+
 
 class LatentSetMatchingMetric(Metric[Collection[T]]):
     """A metric derived to support matching latent variables defined in structures."""
@@ -153,12 +304,14 @@ class LatentSetMatchingMetric(Metric[Collection[T]]):
             raise ValueError(f"{cls} has to be a dataclass.")
         self.inner = inner
         self.constraint = MatchingConstraint.from_str(constraint) if isinstance(constraint, str) else constraint
+        # variables of an object always match themselves, so self scores need no ILP
+        self._set_matching = SetMatchingMetric(self.inner, self.constraint)
 
     def compute(self, x: Collection[T], y: Collection[T]) -> tuple[float, Matching]:
         """Score two collections of objects."""
         original_x, original_y = x, y
-        x = list(x)
-        y = list(y)
+        x = _as_sequence(x)
+        y = _as_sequence(y)
 
         x_is_empty = len(x) == 0
         y_is_empty = len(y) == 0
@@ -170,6 +323,10 @@ class LatentSetMatchingMetric(Metric[Collection[T]]):
 
         gram_matrix = self.inner.gram_matrix(x, y)
         problem = ILPMatchingProblem(x, y, gram_matrix, has_vars=True)
+        if problem.n_x_vars == 0 or problem.n_y_vars == 0:
+            # no variables can be matched, so no latent constraints apply and this is a plain assignment
+            score, matches = AssignmentProblem(x, y, gram_matrix, self.constraint).solve()
+            return score, _matching_from_triples(original_x, original_y, score, x, y, matches)
         problem.add_matching_constraint(self.constraint)
         problem.add_variable_matching_constraint()
         problem.add_latent_variable_constraint(self.cls)
@@ -178,4 +335,8 @@ class LatentSetMatchingMetric(Metric[Collection[T]]):
 
     def score_self(self, x: Collection[T]) -> float:
         """Score a collection of objects with itself."""
-        return SetMatchingMetric(self.inner, self.constraint).score_self(x)
+        return self._set_matching.score_self(x)
+
+    @property
+    def deterministic(self) -> bool:
+        return self.inner.deterministic
@@ -1,13 +1,16 @@
 """Metric interface and implementations for commonly used metrics."""
 
+import sys
 from abc import abstractmethod
 from dataclasses import dataclass, is_dataclass
 from functools import reduce
-from operator import mul
+from operator import attrgetter, mul
 from typing import (
+    Any,
     Callable,
     ClassVar,
     Generic,
+    Optional,
     Protocol,
     TypeVar,
     Union,
@@ -51,6 +54,76 @@ class Metric(Generic[T]):
         """
         return self.score(x, x)
 
+    @property
+    def symmetric(self) -> bool:
+        r"""Whether $\phi(x, y) = \phi(y, x)$ is known to hold for all $x, y$.
+
+        This defaults to `False`; metrics that are symmetric by construction override it so that self Gram matrices
+        only need to score each pair once.
+        """
+        return False
+
+    @property
+    def deterministic(self) -> bool:
+        r"""Whether scoring the same objects always gives the same scores.
+
+        This defaults to `True`, which allows batched scoring to self-score an object occurring several times in a batch
+        only once. Metrics with random or stateful scoring should override it to return `False`; metrics composed of
+        other metrics are deterministic iff all of them are.
+        """
+        return True
+
+    def score_triplet(self, x: T, y: T) -> tuple[float, float, float]:
+        r"""Scores two objects together with their self scores: $(\phi(x, x), \phi(y, y), \phi(x, y))$.
+
+        Aggregators need all three scores for each pair. Metrics whose three scores share work (e.g. hashing the
+        elements of both objects) should override this function to compute it only once.
+        """
+        return self.score_self(x), self.score_self(y), self.score(x, y)
+
+    def score_self_batch(self, xs: Sequence[T]) -> np.ndarray:
+        r"""Scores each object in a collection against itself.
+
+        Args:
+            xs: A collection of objects $\{x_1, \ldots, x_n\}$.
+
+        Returns:
+            A vector $v$ where $v_i = \phi(x_i, x_i)$.
+        """
+        score_self = self.score_self
+        if not self.deterministic:
+            return np.fromiter((score_self(x) for x in xs), dtype=np.float64, count=len(xs))
+        # an object that occurs several times in the collection (e.g. a reference scored against many predictions) is
+        # only scored once; ids are stable here since `xs` keeps every object alive
+        scores: dict[int, float] = {}
+
+        def _score(x: T) -> float:
+            key = id(x)
+            score = scores.get(key)
+            if score is None:
+                score = scores[key] = score_self(x)
+            return score
+
+        return np.fromiter((_score(x) for x in xs), dtype=np.float64, count=len(xs))
+
+    def score_batch(self, xs: Sequence[T], ys: Sequence[T]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        r"""Scores a batch of pairs of objects, together with the self scores of both sides.
+
+        Metrics that can score a batch faster than pair by pair should override this function.
+
+        Args:
+            xs: A collection of objects $\{x_1, \ldots, x_n\}$.
+            ys: A collection of objects $\{y_1, \ldots, y_n\}$.
+
+        Returns:
+            Three vectors $(u, v, w)$ where $u_i = \phi(x_i, x_i)$, $v_i = \phi(y_i, y_i)$, and $w_i = \phi(x_i, y_i)$.
+        """
+        n = len(xs)
+        sxy = np.fromiter((self.score(x, y) for x, y in zip(xs, ys)), dtype=np.float64, count=n)
+        # both sides are self-scored together, so that objects occurring on both sides are scored once
+        self_scores = self.score_self_batch([*xs, *ys])
+        return self_scores[:n], self_scores[n:], sxy
+
     def gram_matrix(self, xs: Sequence[T], ys: Sequence[T]) -> np.ndarray:
         r"""Computes the Gram matrix of the metric given two collections of objects.
 
@@ -63,7 +136,37 @@ class Metric(Generic[T]):
                                 \vdots & \ddots & \vdots \\
                                 \phi(x_n, y_1) & \cdots & \phi(x_n, y_m) \end{bmatrix}$.
         """
-        return np.array([[self.score(x, y) for y in ys] for x in xs])
+        if xs is ys:
+            return self.gram_matrix_self(xs)
+        score = self.score
+        g = np.empty((len(xs), len(ys)))
+        for i, x in enumerate(xs):
+            row = g[i]
+            for j, y in enumerate(ys):
+                row[j] = score(x, y)
+        return g
+
+    def gram_matrix_self(self, xs: Sequence[T]) -> np.ndarray:
+        r"""Computes the Gram matrix of the metric of a collection of objects against itself.
+
+        The diagonal is scored by `score`, since `score_self` may differ from $\phi(x, x)$ (e.g. it is 1 for normalized
+        metrics). If the metric is `symmetric`, only the upper triangle is scored and then mirrored.
+
+        Args:
+            xs: A collection of objects $\{x_1, \ldots, x_n\}$.
+
+        Returns:
+            A Gram matrix $G$ where $G_{ij} = \phi(x_i, x_j)$.
+        """
+        n = len(xs)
+        symmetric = self.symmetric
+        g = np.empty((n, n))
+        for i in range(n):
+            g[i, i] = self.score(xs[i], xs[i])
+            for j in range(i + 1, n):
+                g[i, j] = self.score(xs[i], xs[j])
+                g[j, i] = g[i, j] if symmetric else self.score(xs[j], xs[i])
+        return g
 
     def contramap(self, f: Callable[[S], T]) -> "Metric[S]":
         r"""Returns a new metric $\phi^\prime$ by first preprocessing the objects by a given function $f: S \to T$.
@@ -125,6 +228,28 @@ class ContramappedMetric(Metric[S]):
         """Scores an object against itself."""
         return self.inner.score_self(self.f(x))
 
+    def score_batch(self, xs: Sequence[S], ys: Sequence[S]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Scores a batch of pairs with the inner metric's batched scoring, preprocessing each object only once."""
+        return self.inner.score_batch([self.f(x) for x in xs], [self.f(y) for y in ys])
+
+    def gram_matrix(self, xs: Sequence[S], ys: Sequence[S]) -> np.ndarray:
+        """Computes the Gram matrix, preprocessing each object only once."""
+        if xs is ys:
+            return self.gram_matrix_self(xs)
+        return self.inner.gram_matrix([self.f(x) for x in xs], [self.f(y) for y in ys])
+
+    def gram_matrix_self(self, xs: Sequence[S]) -> np.ndarray:
+        """Computes the Gram matrix against itself, preprocessing each object only once."""
+        return self.inner.gram_matrix_self([self.f(x) for x in xs])
+
+    @property
+    def symmetric(self) -> bool:
+        return self.inner.symmetric
+
+    @property
+    def deterministic(self) -> bool:
+        return self.inner.deterministic
+
 
 class DiscreteMetric(Metric[T]):
     """A metric for discrete objects."""
@@ -139,10 +264,47 @@ class DiscreteMetric(Metric[T]):
             return 1.0, Matching([Match(Path(), x, Path(), y, 1.0)])
         return 0.0, Matching([])
 
+    def score(self, x: T, y: T) -> float:
+        """Score two objects without building a matching."""
+        return 1.0 if x == y else 0.0
+
     def score_self(self, x: T) -> float:
         """Scores an object against itself."""
         return 1.0
 
+    def score_self_batch(self, xs: Sequence[T]) -> np.ndarray:
+        """Scores each object in a collection against itself."""
+        return np.ones(len(xs))
+
+    def score_batch(self, xs: Sequence[T], ys: Sequence[T]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Scores a batch of pairs by equality; all self scores are 1."""
+        n = len(xs)
+        sxy = np.fromiter((x == y for x, y in zip(xs, ys)), dtype=np.float64, count=n)
+        return np.ones(n), np.ones(n), sxy
+
+    @property
+    def symmetric(self) -> bool:
+        return True
+
+    def gram_matrix(self, xs: Sequence[T], ys: Sequence[T]) -> np.ndarray:
+        """Computes the Gram matrix of two collections of objects by comparing equality classes."""
+        if xs is ys:
+            return self.gram_matrix_self(xs)
+        try:
+            classes = _equality_classes([*xs, *ys])
+        except TypeError:  # unhashable objects
+            return super().gram_matrix(xs, ys)
+        n = len(xs)
+        return (classes[:n, None] == classes[None, n:]).astype(np.float64)
+
+    def gram_matrix_self(self, xs: Sequence[T]) -> np.ndarray:
+        """Computes the Gram matrix of a collection of objects against itself by comparing equality classes."""
+        try:
+            classes = _equality_classes(xs)
+        except TypeError:  # unhashable objects
+            return super().gram_matrix_self(xs)
+        return (classes[:, None] == classes[None, :]).astype(np.float64)
+
 
 class ProductMetric(Metric[T]):
     """A metric that is the product of other metrics."""
@@ -151,6 +313,11 @@ class ProductMetric(Metric[T]):
         if not is_dataclass(cls):
             raise ValueError(f"{cls} has to be a dataclass.")
         self.field_metrics = field_metrics
+        # field getters and bound scoring methods are resolved once, so that scoring is a loop of direct calls
+        self._field_scorers = tuple(
+            (attrgetter(fld), metric.score, _self_scorer(metric)) for fld, metric in field_metrics.items()
+        )
+        self._equality_key = _product_equality_key(field_metrics)
 
     def compute(self, x: T, y: T) -> tuple[float, Matching]:
         """Score two objects."""
@@ -167,6 +334,107 @@ class ProductMetric(Metric[T]):
 
         return total_score, Matching(_matching())
 
+    def score(self, x: T, y: T) -> float:
+        """Score two objects, stopping at the first field that scores zero."""
+        total_score = 1.0
+        for get, score, _ in self._field_scorers:
+            s = score(get(x), get(y))
+            if s == 0.0:
+                return 0.0
+            total_score *= s
+        return total_score
+
+    def score_self(self, x: T) -> float:
+        """Scores an object against itself as the product of the scores of its fields against themselves."""
+        total_score = 1.0
+        for get, _, score_self in self._field_scorers:
+            s = score_self(get(x))
+            if s == 0.0:
+                return 0.0
+            total_score *= s
+        return total_score
+
+    @property
+    def symmetric(self) -> bool:
+        return all(m.symmetric for m in self.field_metrics.values())
+
+    @property
+    def deterministic(self) -> bool:
+        return all(m.deterministic for m in self.field_metrics.values())
+
+    def gram_matrix(self, xs: Sequence[T], ys: Sequence[T]) -> np.ndarray:
+        """Computes the Gram matrix, by comparing equality classes of keys if every field is compared by equality."""
+        if self._equality_key is None or xs is ys:
+            return super().gram_matrix(xs, ys)
+        key = self._equality_key
+        try:
+            classes = _equality_classes([key(x) for x in (*xs, *ys)])
+        except TypeError:  # unhashable field values
+            return super().gram_matrix(xs, ys)
+        n = len(xs)
+        return (classes[:n, None] == classes[None, n:]).astype(np.float64)
+
+    def gram_matrix_self(self, xs: Sequence[T]) -> np.ndarray:
+        """Computes the Gram matrix against itself, by comparing equality classes of keys if possible."""
+        if self._equality_key is None:
+            return super().gram_matrix_self(xs)
+        key = self._equality_key
+        try:
+            classes = _equality_classes([key(x) for x in xs])
+        except TypeError:  # unhashable field values
+            return super().gram_matrix_self(xs)
+        return (classes[:, None] == classes[None, :]).astype(np.float64)
+
+
+def _self_scorer(metric: Metric[T]) -> Callable[[T], float]:
+    r"""Returns a function computing $\phi(x, x)$ for a field metric.
+
+    `score_self` is only used where it is known to equal $\phi(x, x)$: it may differ elsewhere (e.g. it is 1 for
+    normalized metrics, and it counts duplicates that a one-to-one set matching leaves unmatched).
+    """
+    if _compares_by_equality(metric):
+        return metric.score_self
+    score = metric.score
+    return lambda x: score(x, x)
+
+
+def _product_equality_key(field_metrics: dict[str, Metric]) -> Optional[Callable[[Any], Any]]:
+    """Returns a key function if every field of a product metric is compared by equality, and `None` otherwise.
+
+    Such a product metric scores two objects 1 if their keys are equal and 0 otherwise, so that it can be evaluated by
+    hashing keys like a [`DiscreteMetric`].
+    """
+    getters: list[Callable[[Any], Any]] = []
+    for fld, metric in field_metrics.items():
+        if isinstance(metric, DiscreteMetric):
+            getters.append(attrgetter(fld))
+        elif isinstance(metric, ProductMetric) and metric._equality_key is not None:
+            get, inner_key = attrgetter(fld), metric._equality_key
+            getters.append(lambda x, get=get, inner_key=inner_key: inner_key(get(x)))
+        else:
+            return None
+    return lambda x: tuple(get(x) for get in getters)
+
+
+def _compares_by_equality(metric: Metric[T]) -> bool:
+    """Whether a metric scores two objects 1 if they are equal and 0 otherwise."""
+    return isinstance(metric, DiscreteMetric) or (
+        isinstance(metric, ProductMetric) and metric._equality_key is not None
+    )
+
+
+def _equality_keys(metric: Metric[T], xs: Sequence[T]) -> Optional[Sequence[Any]]:
+    """Maps objects to keys that are equal iff the metric scores them 1, if the metric only compares by equality.
+
+    Returns `None` for metrics that may score pairs other than 0 or 1.
+    """
+    if isinstance(metric, DiscreteMetric):
+        return xs
+    if isinstance(metric, ProductMetric) and metric._equality_key is not None:
+        key = metric._equality_key
+        return [key(x) for x in xs]
+    return None
+
 
 class UnionMetric(Metric[T]):
     """A metric that is the union of other metrics."""
@@ -184,10 +452,31 @@ class UnionMetric(Metric[T]):
             return 0.0, Matching([])
         return self.case_metrics[x_type].compute(x, y)
 
+    def score(self, x: T, y: T) -> float:
+        """Score two objects without building a matching."""
+        x_type = type(x)
+        if type(y) is not x_type:
+            return 0.0
+        return self.case_metrics[x_type].score(x, y)
+
     def score_self(self, x: T) -> float:
         """Scores an object against itself."""
         return 1.0
 
+    @property
+    def symmetric(self) -> bool:
+        return all(m.symmetric for m in self.case_metrics.values())
+
+    @property
+    def deterministic(self) -> bool:
+        return all(m.deterministic for m in self.case_metrics.values())
+
+
+def _equality_classes(xs: Sequence[T]) -> np.ndarray:
+    """Assigns each object the index of its equality class, so that $x_i = x_j$ iff their classes are equal."""
+    classes: dict[T, int] = {}
+    return np.fromiter((classes.setdefault(x, len(classes)) for x in xs), dtype=np.intp, count=len(xs))
+
 
 @dataclass(eq=True, frozen=True)
 class Variable:
@@ -197,6 +486,11 @@ class Variable:
 
     latent_metric: ClassVar[Metric["Variable"]] = Metric.from_function(lambda x, y: 1.0)
 
+    def __post_init__(self):
+        """Interns the name so that equality checks between variables short-circuit on identity."""
+        if type(self.name) is str:
+            object.__setattr__(self, "name", sys.intern(self.name))
+
 
 @runtime_checkable
 class HasMetric(Protocol[T]):
@@ -6,8 +6,8 @@ from collections.abc import Sequence
 
 from metametric.core.matching import Hook
 from metametric.core.metric import Metric
-from metametric.core.reduction import Reduction
-from metametric.core.state import MetricState, MultipleMetricStates, SingleMetricState
+from metametric.core.reduction import Reduction, _join_key
+from metametric.core.state import MetricState, MultipleMetricStates, SingleMetricState, _LazyThreadPoolExecutor
 
 T = TypeVar("T", contravariant=True)
 
@@ -15,6 +15,8 @@ T = TypeVar("T", contravariant=True)
 class Aggregator(Protocol[T]):
     """Metric aggregator for computing metrics on a stream of predictions and references."""
 
+    __slots__ = ()
+
     @property
     def state(self) -> MetricState[T]:
         """The internal state of the aggregator."""
@@ -72,6 +74,8 @@ class MetricFamily(MetricSuite[T]):
 class MetricFamilyAggregator(Aggregator[T]):
     """Aggregator for a metric family."""
 
+    __slots__ = ("family", "_state", "_hooks")
+
     def __init__(self, family: MetricFamily[T], hooks: Optional[dict[str, Hook[Any]]] = None):
         self.family = family
         self._state = SingleMetricState(family.metric)
@@ -90,25 +94,54 @@ class MetricFamilyAggregator(Aggregator[T]):
 
 
 class MultipleMetricFamilies(MetricSuite[T]):
-    """A collection of metric families, whose internal states are separate."""
+    """A collection of metric families, whose internal states are separate.
 
-    def __init__(self, families: dict[str, MetricSuite[T]]):
+    Args:
+        families: The metric suites to compute together, by name.
+        max_workers: If given, the families score batches concurrently on a pool of this many threads. The pool is
+            shared by every aggregator of the suite and only started by the first batch; `close` stops its threads,
+            which is also done on leaving the suite as a context manager.
+    """
+
+    def __init__(self, families: dict[str, MetricSuite[T]], max_workers: Optional[int] = None):
         self.families = families
+        self.max_workers = max_workers
+        self._executor = _LazyThreadPoolExecutor(max_workers) if max_workers is not None else None
 
     def new(self, hooks: Optional[dict[str, Hook[Any]]] = None) -> Aggregator[T]:
         return MultipleMetricFamiliesAggregator(self, hooks)
 
+    def close(self) -> None:
+        """Stops the threads of the suite's pool, if any. Scoring another batch starts them again."""
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def __enter__(self) -> "MultipleMetricFamilies[T]":
+        """Returns the suite itself."""
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Closes the suite."""
+        self.close()
+
 
 class MultipleMetricFamiliesAggregator(Aggregator[T]):
     """Aggregator for multiple metric families."""
 
+    __slots__ = ("aggs", "_hooks", "_state")
+
     def __init__(self, coll: MultipleMetricFamilies[T], hooks: Optional[dict[str, Hook[Any]]] = None):
         self.aggs: dict[str, Aggregator[T]] = {name: family.new() for name, family in coll.families.items()}
         self._hooks = hooks
+        # the child states are fixed once the aggregators exist, so the combined state (and its grouping of shared
+        # metrics) is built once rather than on every update
+        self._state = MultipleMetricStates(
+            {name: agg.state for name, agg in self.aggs.items()}, executor=coll._executor
+        )
 
     @property
     def state(self) -> MetricState[T]:
-        return MultipleMetricStates({name: agg.state for name, agg in self.aggs.items()})
+        return self._state
 
     @property
     def hooks(self) -> Optional[dict[str, Hook[Any]]]:
@@ -116,9 +149,7 @@ class MultipleMetricFamiliesAggregator(Aggregator[T]):
 
     def compute(self) -> dict[str, float]:
         metrics = {
-            f"{name}-{key}" if key != "" else name: value
-            for name, agg in self.aggs.items()
-            for key, value in agg.compute().items()
+            _join_key(name, key): value for name, agg in self.aggs.items() for key, value in agg.compute().items()
         }
         return metrics
 
@@ -137,6 +168,8 @@ class MetricSuiteWithExtra(MetricSuite[T]):
 class WithExtraAggregator(Aggregator[T]):
     """Aggregator for a metric suite with extra metrics."""
 
+    __slots__ = ("agg", "extra", "_hooks")
+
     def __init__(self, coll: MetricSuiteWithExtra[T], hooks: Optional[dict[str, Hook[Any]]] = None):
         self.agg = coll.original.new(hooks)
         self.extra = coll.extra
@@ -1,6 +1,9 @@
 """Normalizers to normalize metrics as normalized metrics."""
 
 from typing import Optional, Protocol, TypeVar, runtime_checkable
+from collections.abc import Sequence
+
+import numpy as np
 
 from metametric.core.matching import Matching, Match, Path
 from metametric.core.metric import Metric
@@ -12,6 +15,8 @@ T = TypeVar("T")
 class Normalizer(Protocol):
     """A metric that normalizes another metric."""
 
+    __slots__ = ()
+
     def normalize(self, score_xy: float, score_xx: float, score_yy: float) -> float:
         """Normalize the metric.
 
@@ -25,6 +30,26 @@ class Normalizer(Protocol):
         """
         raise NotImplementedError()
 
+    def normalize_array(self, score_xy: np.ndarray, score_xx: np.ndarray, score_yy: np.ndarray) -> np.ndarray:
+        """Normalize many scores at once, elementwise.
+
+        Normalizers with a closed form override this with vectorized operations; by default `normalize` is applied
+        to each triple of scores.
+
+        Args:
+            score_xy (`np.ndarray`): The scores between pairs of objects.
+            score_xx (`np.ndarray`): The scores of the first objects with themselves.
+            score_yy (`np.ndarray`): The scores of the second objects with themselves.
+
+        Returns:
+            `np.ndarray`: The normalized scores.
+        """
+        return np.fromiter(
+            (self.normalize(sxy, sxx, syy) for sxy, sxx, syy in zip(score_xy, score_xx, score_yy)),
+            dtype=np.float64,
+            count=len(score_xy),
+        )
+
     @property
     def name(self) -> str:
         """Get the name of the normalizer."""
@@ -48,13 +73,28 @@ class Normalizer(Protocol):
             raise ValueError(f"Unknown normalizer {s}")
 
 
+def _divide(numerator: np.ndarray, denominator: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Divides elementwise, raising `ZeroDivisionError` on a zero denominator as the scalar `normalize` does."""
+    if not denominator.all():
+        raise ZeroDivisionError("float division by zero")
+    return np.divide(numerator, denominator, out=out)
+
+
 class Jaccard(Normalizer):
     """Jaccard metric."""
 
+    __slots__ = ()
+
     def normalize(self, score_xy: float, score_xx: float, score_yy: float) -> float:
         """Normalize the metric using Jaccard metric."""
         return score_xy / (score_xx + score_yy - score_xy)
 
+    def normalize_array(self, score_xy: np.ndarray, score_xx: np.ndarray, score_yy: np.ndarray) -> np.ndarray:
+        """Normalize many scores at once using Jaccard metric."""
+        denominator = np.add(score_xx, score_yy)
+        denominator -= score_xy
+        return _divide(score_xy, denominator, out=denominator)  # reuse the only temporary as the output
+
     @property
     def name(self) -> str:
         """Get the name of the normalizer."""
@@ -64,10 +104,16 @@ class Jaccard(Normalizer):
 class Precision(Normalizer):
     """Precision metric."""
 
+    __slots__ = ()
+
     def normalize(self, score_xy: float, score_xx: float, score_yy: float) -> float:
         """Normalize the metric using precision metric."""
         return score_xy / score_xx
 
+    def normalize_array(self, score_xy: np.ndarray, score_xx: np.ndarray, score_yy: np.ndarray) -> np.ndarray:
+        """Normalize many scores at once using precision metric."""
+        return _divide(score_xy, score_xx)
+
     @property
     def name(self) -> str:
         """Get the name of the normalizer."""
@@ -77,10 +123,16 @@ class Precision(Normalizer):
 class Recall(Normalizer):
     """Recall metric."""
 
+    __slots__ = ()
+
     def normalize(self, score_xy: float, score_xx: float, score_yy: float) -> float:
         """Normalize the metric using recall metric."""
         return score_xy / score_yy
 
+    def normalize_array(self, score_xy: np.ndarray, score_xx: np.ndarray, score_yy: np.ndarray) -> np.ndarray:
+        """Normalize many scores at once using recall metric."""
+        return _divide(score_xy, score_yy)
+
     @property
     def name(self) -> str:
         """Get the name of the normalizer."""
@@ -90,21 +142,47 @@ class Recall(Normalizer):
 class FScore(Normalizer):
     """F-score metric."""
 
+    __slots__ = ("beta", "_beta2", "_is_f1", "_name")
+
     def __init__(self, beta: float = 1.0):
         self.beta = beta
+        # resolved once, as `normalize` runs once per aggregated pair
+        self._beta2 = beta * beta
+        self._is_f1 = beta == 1.0
+        if self._is_f1:
+            self._name = "f1"
+        else:
+            b = int(beta) if float(beta).is_integer() else beta
+            self._name = f"f{b}"
 
     def normalize(self, score_xy: float, score_xx: float, score_yy: float) -> float:
         """Normalize the metric using F-score metric."""
-        return (1 + self.beta**2) * score_xy / ((self.beta**2) * score_yy + score_xx) if score_xy > 0.0 else 0.0
+        if not score_xy > 0.0:
+            return 0.0
+        if self._is_f1:
+            return 2.0 * score_xy / (score_xx + score_yy)
+        return (1 + self._beta2) * score_xy / (self._beta2 * score_yy + score_xx)
+
+    def normalize_array(self, score_xy: np.ndarray, score_xx: np.ndarray, score_yy: np.ndarray) -> np.ndarray:
+        """Normalize many scores at once using F-score metric."""
+        b2 = self._beta2
+        numerator = np.multiply(score_xy, 1 + b2)
+        if self._is_f1:
+            denominator = np.add(score_xx, score_yy)
+        else:
+            denominator = np.multiply(score_yy, b2)
+            denominator += score_xx
+        # only divide where the score is positive, as the scalar version does; elsewhere the result stays 0
+        positive = score_xy > 0.0
+        if not denominator[positive].all():
+            raise ZeroDivisionError("float division by zero")
+        out = np.zeros(len(score_xy))
+        return np.divide(numerator, denominator, out=out, where=positive)
 
     @property
     def name(self) -> str:
         """Get the name of the FScore based on `beta`."""
-        if self.beta == 1.0:
-            return "f1"
-        else:
-            b = int(self.beta) if self.beta.is_integer() else self.beta
-            return f"f{b}"
+        return self._name
 
 
 class NormalizedMetric(Metric[T]):
@@ -133,6 +211,25 @@ class NormalizedMetric(Metric[T]):
 
         return normalized_score, Matching(_matching())
 
+    def score(self, x: T, y: T) -> float:
+        """Score two objects from the inner scores, without building a matching."""
+        sxx, syy, sxy = self.inner.score_triplet(x, y)
+        return self.normalizer.normalize(sxy, sxx, syy)
+
     def score_self(self, x: T) -> float:
         """Score an object with itself."""
         return 1.0
+
+    def score_triplet(self, x: T, y: T) -> tuple[float, float, float]:
+        """Score two objects together with their self scores, which are 1 after normalization."""
+        return 1.0, 1.0, self.score(x, y)
+
+    def score_batch(self, xs: Sequence[T], ys: Sequence[T]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Score a batch of pairs by normalizing the inner batch scores all at once."""
+        sxx, syy, sxy = self.inner.score_batch(xs, ys)
+        ones = np.ones(len(xs))
+        return ones, ones.copy(), self.normalizer.normalize_array(sxy, sxx, syy)
+
+    @property
+    def deterministic(self) -> bool:
+        return self.inner.deterministic
@@ -1,19 +1,32 @@
 """Metric aggregator for computing metrics on a batch of predictions and references."""
 
+import sys
+from functools import cache
 from typing import Callable, Optional, Protocol
 from collections.abc import Collection
 
+import numpy as np
+
 from metametric.core.normalizers import Normalizer
 from metametric.core.state import SingleMetricState
 
 
+def _named_normalizers(normalizers: Collection[Optional[Normalizer]]) -> tuple[tuple[str, Normalizer], ...]:
+    """Pairs each normalizer with its name, resolved once instead of on every computation."""
+    return tuple((sys.intern(normalizer.name), normalizer) for normalizer in normalizers if normalizer is not None)
+
+
+@cache
+def _join_key(prefix: str, name: str) -> str:
+    """Joins a prefix and a metric name into an output key, formatted and interned once per distinct pair."""
+    return sys.intern(f"{prefix}-{name}" if name != "" else prefix)
+
+
 def _compute_normalized_metrics(
-    normalizers: Collection[Optional[Normalizer]], sxy: float, sxx: float, syy: float
+    named_normalizers: Collection[tuple[str, Normalizer]], include_raw: bool, sxy: float, sxx: float, syy: float
 ) -> dict[str, float]:
-    normalized_metrics = {
-        normalizer.name: normalizer.normalize(sxy, sxx, syy) for normalizer in normalizers if normalizer is not None
-    }
-    if None in normalizers:
+    normalized_metrics = {name: normalizer.normalize(sxy, sxx, syy) for name, normalizer in named_normalizers}
+    if include_raw:
         normalized_metrics[""] = sxy
     return normalized_metrics
 
@@ -37,18 +50,28 @@ class MacroAverage(Reduction):
 
     def __init__(self, normalizers: Collection[Optional[Normalizer]]):
         self.normalizers = normalizers
-        self.normalizer_names = [normalizer.name for normalizer in normalizers if normalizer is not None]
-        if None in normalizers:
+        self._named_normalizers = _named_normalizers(normalizers)
+        self._include_raw = None in normalizers
+        self.normalizer_names = [name for name, _ in self._named_normalizers]
+        if self._include_raw:
             self.normalizer_names.append("")
 
     def compute(self, state: SingleMetricState) -> dict[str, float]:
-        n = len(state)
-        metrics_per_sample = [
-            _compute_normalized_metrics(self.normalizers, sxy, sxx, syy)
-            for sxy, sxx, syy in zip(state.matches, state.preds, state.refs)
-        ]
-        metrics = {name: sum(metric[name] for metric in metrics_per_sample) / n for name in self.normalizer_names}
-        return metrics
+        """Averages the normalized scores of each pair.
+
+        As with micro-averaging, a pair whose normalizer divides by zero raises `ZeroDivisionError`, and so does
+        averaging over no pairs at all.
+        """
+        if len(state) == 0:
+            raise ZeroDivisionError("cannot macro-average over no predictions")
+        sxy, sxx, syy = state.matches, state.preds, state.refs
+        # one row of per-sample scores per output, averaged together in a single reduction
+        scores = np.empty((len(self.normalizer_names), len(state)))
+        for k, (_, normalizer) in enumerate(self._named_normalizers):
+            scores[k] = normalizer.normalize_array(sxy, sxx, syy)
+        if self._include_raw:
+            scores[-1] = sxy
+        return dict(zip(self.normalizer_names, scores.mean(axis=1).tolist()))
 
 
 class MicroAverage(Reduction):
@@ -56,16 +79,12 @@ class MicroAverage(Reduction):
 
     def __init__(self, normalizers: Collection[Optional[Normalizer]]):
         self.normalizers = normalizers
+        self._named_normalizers = _named_normalizers(normalizers)
+        self._include_raw = None in normalizers
 
     def compute(self, state: SingleMetricState) -> dict[str, float]:
-        sxy_total = sum(state.matches)
-        sxx_total = sum(state.preds)
-        syy_total = sum(state.refs)
-        metrics = {
-            name: value
-            for name, value in _compute_normalized_metrics(self.normalizers, sxy_total, sxx_total, syy_total).items()
-        }
-        return metrics
+        sxy_total, sxx_total, syy_total = state.totals
+        return _compute_normalized_metrics(self._named_normalizers, self._include_raw, sxy_total, sxx_total, syy_total)
 
 
 class MultipleReductions(Reduction):
@@ -76,7 +95,7 @@ class MultipleReductions(Reduction):
 
     def compute(self, state: SingleMetricState) -> dict[str, float]:
         return {
-            (f"{prefix}-{name}" if name != "" else prefix): value
+            _join_key(prefix, name): value
             for prefix, family in self.reductions.items()
             for name, value in family.compute(state).items()
         }
@@ -1,17 +1,25 @@
 """Defines the states of metric aggregators."""
 
-from typing import Protocol, TypeVar, Any, Optional
-from collections.abc import Sequence
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Protocol, TypeVar, Any, Optional
+from collections.abc import Iterable, Iterator, Sequence
+
+import numpy as np
 
 from metametric.core.matching import Hook
 from metametric.core.metric import Metric
 
 T = TypeVar("T", contravariant=True)
 
+_INITIAL_CAPACITY = 64
+
 
 class MetricState(Protocol[T]):
     """Encapsulates the state of a metric aggregator."""
 
+    __slots__ = ()
+
     def update_single(self, pred: T, ref: T, hooks: Optional[dict[str, Hook[Any]]] = None) -> None:
         """Update the aggregator with a single prediction and its reference."""
         raise NotImplementedError()
@@ -30,50 +38,289 @@ class MetricState(Protocol[T]):
         raise NotImplementedError()
 
 
+class _ScoreArena:
+    """A growable `(3, capacity)` `float64` arena of score triples, doubling its capacity when full.
+
+    Rows hold the self scores of the predictions, the self scores of the references, and the scores between them, so
+    that each kind of score is contiguous. Running totals of the three rows are kept up to date on every update.
+    """
+
+    __slots__ = ("buf", "size", "pred_total", "ref_total", "match_total")
+
+    def __init__(self, capacity: int = _INITIAL_CAPACITY):
+        self.buf = np.empty((3, capacity))
+        self.size = 0
+        self.pred_total = 0.0
+        self.ref_total = 0.0
+        self.match_total = 0.0
+
+    def _reserve(self, k: int) -> None:
+        """Ensure that the arena can hold `k` more triples."""
+        capacity = self.buf.shape[1]
+        if self.size + k <= capacity:
+            return
+        while capacity < self.size + k:
+            capacity *= 2
+        buf = np.empty((3, capacity))
+        buf[:, : self.size] = self.buf[:, : self.size]
+        self.buf = buf
+
+    def append(self, sxx: float, syy: float, sxy: float) -> None:
+        self._reserve(1)
+        buf, n = self.buf, self.size
+        buf[0, n] = sxx
+        buf[1, n] = syy
+        buf[2, n] = sxy
+        self.size = n + 1
+        self.pred_total += sxx
+        self.ref_total += syy
+        self.match_total += sxy
+
+    def extend(self, sxx: np.ndarray, syy: np.ndarray, sxy: np.ndarray) -> None:
+        k = len(sxy)
+        self._reserve(k)
+        block = self.buf[:, self.size : self.size + k]
+        block[0] = sxx
+        block[1] = syy
+        block[2] = sxy
+        self.size += k
+        pred_sum, ref_sum, match_sum = block.sum(axis=1).tolist()
+        self.pred_total += pred_sum
+        self.ref_total += ref_sum
+        self.match_total += match_sum
+
+    def clear(self) -> None:
+        """Empty the arena while keeping its allocated capacity."""
+        self.size = 0
+        self.pred_total = 0.0
+        self.ref_total = 0.0
+        self.match_total = 0.0
+
+    def row(self, k: int) -> np.ndarray:
+        """The filled part of the `k`-th row."""
+        return self.buf[k, : self.size]
+
+    def __len__(self):
+        return self.size
+
+
 class SingleMetricState(MetricState[T]):
-    """Encapsulates the state of a single metric aggregator."""
+    """Encapsulates the state of a single metric aggregator.
+
+    Scores are stored in one growable `float64` arena; `preds`, `refs` and `matches` are views of its filled rows.
+    """
+
+    __slots__ = ("metric", "_scores")
 
     def __init__(self, metric: Metric[T]):
         self.metric = metric
-        self.preds = []
-        self.refs = []
-        self.matches = []
+        self._scores = _ScoreArena()
+
+    @property
+    def preds(self) -> np.ndarray:
+        """Self scores of the predictions."""
+        return self._scores.row(0)
+
+    @property
+    def refs(self) -> np.ndarray:
+        """Self scores of the references."""
+        return self._scores.row(1)
+
+    @property
+    def matches(self) -> np.ndarray:
+        """Scores between the predictions and their references."""
+        return self._scores.row(2)
+
+    @property
+    def totals(self) -> tuple[float, float, float]:
+        """Running sums of `matches`, `preds` and `refs`, kept up to date on every update."""
+        scores = self._scores
+        return float(scores.match_total), float(scores.pred_total), float(scores.ref_total)
+
+    def _score_triplet(self, pred: T, ref: T) -> tuple[float, float, float]:
+        """Scores a pair without its matching."""
+        return self.metric.score_triplet(pred, ref)
 
     def update_single(self, pred: T, ref: T, hooks: Optional[dict[str, Hook[Any]]] = None) -> None:
-        """Update the aggregator with a single prediction and its reference."""
-        sxx = self.metric.score_self(pred)
-        syy = self.metric.score_self(ref)
-        sxy, matching = self.metric.compute(pred, ref)
+        """Update the aggregator with a single prediction and its reference.
+
+        Without hooks no matching is needed, so the metric is asked only for its three scores through `score_triplet`.
+        """
         if hooks:
-            matching.run_with_hooks(hooks, data_id=len(self.matches))
-        self.preds.append(sxx)
-        self.refs.append(syy)
-        self.matches.append(sxy)
+            sxx = self.metric.score_self(pred)
+            syy = self.metric.score_self(ref)
+            sxy, matching = self.metric.compute(pred, ref)
+            matching.run_with_hooks(hooks, data_id=len(self))
+        else:
+            sxx, syy, sxy = self._score_triplet(pred, ref)
+        self._append(sxx, syy, sxy)
+
+    def _append(self, sxx: float, syy: float, sxy: float) -> None:
+        self._scores.append(sxx, syy, sxy)
+
+    def _score_batch(self, preds: Sequence[T], refs: Sequence[T]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Scores a batch without matchings, with the metric's batched kernel if it provides one.
+
+        The default kernel self-scores an object occurring several times in the batch (e.g. a reference scored against
+        many predictions) only once. Self scores are never reused across batches, since objects may be changed between
+        updates.
+        """
+        metric = self.metric
+        if type(metric).score_batch is not Metric.score_batch or (
+            metric.deterministic and type(metric).score_triplet is Metric.score_triplet
+        ):
+            return metric.score_batch(preds, refs)
+        n = len(preds)
+        sxx, syy, sxy = np.empty(n), np.empty(n), np.empty(n)
+        for k, (pred, ref) in enumerate(zip(preds, refs)):
+            sxx[k], syy[k], sxy[k] = self._score_triplet(pred, ref)
+        return sxx, syy, sxy
+
+    def _extend(self, sxx: np.ndarray, syy: np.ndarray, sxy: np.ndarray) -> None:
+        self._scores.extend(sxx, syy, sxy)
+
+    def update_batch(self, preds: Sequence[T], refs: Sequence[T], hooks: Optional[dict[str, Hook[Any]]] = None) -> None:
+        """Update the aggregator with a batch of predictions and their references.
+
+        If no hooks need the matchings, the whole batch is scored before being appended at once, with the metric's
+        batched kernel if it provides one.
+        """
+        if hooks:
+            super().update_batch(preds, refs, hooks)
+            return
+        self._extend(*self._score_batch(preds, refs))
 
     def reset(self) -> None:
-        """Reset the aggregator to its initialization state."""
-        self.preds = []
-        self.refs = []
-        self.matches = []
+        """Reset the aggregator to its initialization state.
+
+        The score arena keeps its capacity, so that aggregating epochs of the same size after a reset does not
+        reallocate them. Views obtained before the reset are overwritten by later updates.
+        """
+        self._scores.clear()
 
     def __len__(self):
         """Returns the number of prediction-reference pairs aggregated."""
-        return len(self.matches)
+        return len(self._scores)
+
+
+class _LazyThreadPoolExecutor(Executor):
+    """A thread pool that only starts its threads when a task is first submitted.
+
+    After `shutdown` the pool is started again by the next submission, so that a suite that has been closed stays
+    usable. Pickling keeps only the number of workers.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers)
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+            self._executor = None
+
+    def __reduce__(self):
+        return _LazyThreadPoolExecutor, (self.max_workers,)
+
+
+def _leaf_states(states: Iterable[MetricState[T]]) -> Iterator[MetricState[T]]:
+    """Yields the states that are not themselves collections of states, depth first."""
+    for state in states:
+        if isinstance(state, MultipleMetricStates):
+            yield from _leaf_states(state.states.values())
+        else:
+            yield state
+
+
+def _score_and_extend(
+    score: Callable[[Sequence[T], Sequence[T]], tuple[np.ndarray, np.ndarray, np.ndarray]],
+    extends: Sequence[Callable[[np.ndarray, np.ndarray, np.ndarray], None]],
+    preds: Sequence[T],
+    refs: Sequence[T],
+) -> None:
+    """Scores a batch once and extends every state of a group with the scores."""
+    scores = score(preds, refs)
+    for extend in extends:
+        extend(*scores)
 
 
 class MultipleMetricStates(MetricState[T]):
-    """Encapsulates the state of multiple metric aggregators."""
+    """Encapsulates the state of multiple metric aggregators.
+
+    Single metric states that share the same metric object (e.g. micro- and macro-averaged families of one metric) are
+    grouped, so that without hooks each pair is scored once per group instead of once per state. Nested multiple states
+    are flattened into their leaves for this, so that the grouping and the update loop span the whole tree of states.
 
-    def __init__(self, states: dict[str, MetricState[T]]):
+    Args:
+        states: The states to update together, by name.
+        executor: If given, batches are scored on this executor, one group or state per task. This pays off for
+            metrics that spend most of their time in NumPy or SciPy routines that release the GIL (e.g. the assignment
+            solver), and is off by default. The executor is owned by the caller, so that many states can share one
+            pool. Updates with hooks are always run serially.
+    """
+
+    __slots__ = (
+        "states",
+        "_group_single_updates",
+        "_other_single_updates",
+        "_batch_updates",
+        "_hooked_single_updates",
+        "_hooked_batch_updates",
+        "_executor",
+    )
+
+    def __init__(self, states: dict[str, MetricState[T]], executor: Optional[Executor] = None):
         self.states = states
+        groups: dict[int, list[SingleMetricState[T]]] = {}
+        others: list[MetricState[T]] = []
+        for state in _leaf_states(states.values()):
+            if isinstance(state, SingleMetricState):
+                groups.setdefault(id(state.metric), []).append(state)
+            else:
+                others.append(state)
+        # the bound methods called per update are resolved once here; each group is scored by its first state
+        self._group_single_updates = tuple(
+            (group[0]._score_triplet, tuple(state._append for state in group)) for group in groups.values()
+        )
+        self._other_single_updates = tuple(state.update_single for state in others)
+        # each batch update touches only its own states, so that they can run concurrently
+        self._batch_updates: tuple[Callable[[Sequence[T], Sequence[T]], None], ...] = tuple(
+            partial(_score_and_extend, group[0]._score_batch, tuple(state._extend for state in group))
+            for group in groups.values()
+        ) + tuple(state.update_batch for state in others)
+        self._hooked_single_updates = tuple(state.update_single for state in states.values())
+        self._hooked_batch_updates = tuple(state.update_batch for state in states.values())
+        self._executor = executor
 
     def update_single(self, pred: T, ref: T, hooks: Optional[dict[str, Hook[Any]]] = None) -> None:
-        for state in self.states.values():
-            state.update_single(pred, ref, hooks)
+        if hooks:
+            for update in self._hooked_single_updates:
+                update(pred, ref, hooks)
+            return
+        for score, appends in self._group_single_updates:
+            scores = score(pred, ref)
+            for append in appends:
+                append(*scores)
+        for update in self._other_single_updates:
+            update(pred, ref)
 
     def update_batch(self, preds: Sequence[T], refs: Sequence[T], hooks: Optional[dict[str, Hook[Any]]] = None) -> None:
-        for state in self.states.values():
-            state.update_batch(preds, refs, hooks)
+        if hooks:
+            for update in self._hooked_batch_updates:
+                update(preds, refs, hooks)
+            return
+        if self._executor is not None and len(self._batch_updates) > 1:
+            # consuming the results re-raises any exception from the workers
+            for _ in self._executor.map(lambda update: update(preds, refs), self._batch_updates):
+                pass
+            return
+        for update in self._batch_updates:
+            update(preds, refs)
 
     def reset(self) -> None:
         for state in self.states.values():
@@ -81,4 +328,4 @@ class MultipleMetricStates(MetricState[T]):
 
     def __len__(self):
         """Returns the number of prediction-reference pairs aggregated."""
-        return len(list(self.states.values())[0])
+        return len(next(iter(self.states.values())))
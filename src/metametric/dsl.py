@@ -2,6 +2,7 @@
 
 import sys
 from dataclasses import dataclass, fields, is_dataclass
+from functools import lru_cache
 from typing import (
     Callable,
     Generic,
@@ -47,7 +48,7 @@ DslConfig = Union[
 ]
 
 
-@dataclass
+@dataclass(frozen=True)
 class _Config(Generic[T]):
     cls: type[T]
     constraint: MatchingConstraint = MatchingConstraint.ONE_TO_ONE
@@ -55,23 +56,38 @@ class _Config(Generic[T]):
 
     @classmethod
     def standardize(cls, config: DslConfig[T]) -> "_Config[T]":
-        if isinstance(config, tuple):
-            if len(config) == 2:
-                t, constraint = config
-                normalizer = None
-            elif len(config) == 3:
-                t, constraint, normalizer = config
-                if isinstance(normalizer, str):
-                    normalizer = Normalizer.from_str(normalizer)
-            else:
-                raise ValueError(f"Invalid config: {config}")
-        else:
-            t = config
-            constraint = MatchingConstraint.ONE_TO_ONE
+        try:
+            return _standardize_cached(config)
+        except TypeError:  # unhashable config
+            return _standardize(config)
+
+
+# normalizers are stateless, so each name resolves to one shared instance
+_normalizer_from_str = lru_cache(maxsize=None)(Normalizer.from_str)
+
+
+def _standardize(config: DslConfig[T]) -> _Config[T]:
+    if isinstance(config, tuple):
+        if len(config) == 2:
+            t, constraint = config
             normalizer = None
-        if isinstance(constraint, str):
-            constraint = MatchingConstraint.from_str(constraint)
-        return cls(t, constraint, normalizer)
+        elif len(config) == 3:
+            t, constraint, normalizer = config
+            if isinstance(normalizer, str):
+                normalizer = _normalizer_from_str(normalizer)
+        else:
+            raise ValueError(f"Invalid config: {config}")
+    else:
+        t = config
+        constraint = MatchingConstraint.ONE_TO_ONE
+        normalizer = None
+    if isinstance(constraint, str):
+        constraint = MatchingConstraint.from_str(constraint)
+    return _Config(t, constraint, normalizer)
+
+
+# configs are immutable, so every DSL access with the same config can share one standardized copy
+_standardize_cached = lru_cache(maxsize=None)(_standardize)
 
 
 def from_func(func: Callable[[T, T], float]) -> Metric[T]:
@@ -98,7 +114,14 @@ auto = _Auto()
 
 class _Discrete:
     def __getitem__(self, t: type[T]) -> Metric[T]:
-        return DiscreteMetric(t)
+        try:
+            return _discrete_metric(t)
+        except TypeError:  # unhashable type annotation
+            return DiscreteMetric(t)
+
+
+# discrete metrics are stateless, so one instance per type is shared
+_discrete_metric = lru_cache(maxsize=None)(DiscreteMetric)
 
 
 discrete = _Discrete()
@@ -108,9 +131,9 @@ class _DataClass:
     def __getitem__(self, config: DslConfig[T]) -> Callable[[dict[str, Union[Ell, Metric]]], Metric[T]]:
         cfg = _Config.standardize(config)
         assert is_dataclass(cfg.cls)
+        field_types = {fld.name: fld.type for fld in fields(cfg.cls)}
 
         def product_metric(field_metrics: dict[str, Union[Ell, Metric]]) -> Metric[T]:
-            field_types = {fld.name: fld.type for fld in fields(cfg.cls)}
             field_metrics_no_ell: dict[str, Metric] = {
                 fld: (auto[field_types[fld], cfg.constraint] if metric is ... else metric)  # pyright: ignore
                 for fld, metric in field_metrics.items()
@@ -215,7 +238,7 @@ latent_set_matching = _LatentSetMatching()
 class _Normalize:
     def __getitem__(self, normalizer: Union[Normalizer, str]) -> Callable[[Metric[T]], Metric[T]]:
         if isinstance(normalizer, str):
-            normalizer_obj = Normalizer.from_str(normalizer)
+            normalizer_obj = _normalizer_from_str(normalizer)
         else:
             normalizer_obj = None
 
@@ -231,7 +254,7 @@ normalize = _Normalize()
 def macro_average(normalizers: Collection[Union[Normalizer, str]]) -> Reduction:
     """Macro-average reduction."""
     normalizer_objs = [
-        Normalizer.from_str(normalizer) if isinstance(normalizer, str) else normalizer for normalizer in normalizers
+        _normalizer_from_str(normalizer) if isinstance(normalizer, str) else normalizer for normalizer in normalizers
     ]
     return MacroAverage(normalizer_objs)
 
@@ -239,7 +262,7 @@ def macro_average(normalizers: Collection[Union[Normalizer, str]]) -> Reduction:
 def micro_average(normalizers: Collection[Union[Normalizer, str]]) -> Reduction:
     """Micro-average reduction."""
     normalizer_objs = [
-        Normalizer.from_str(normalizer) if isinstance(normalizer, str) else normalizer for normalizer in normalizers
+        _normalizer_from_str(normalizer) if isinstance(normalizer, str) else normalizer for normalizer in normalizers
     ]
     return MicroAverage(normalizer_objs)
 
@@ -251,9 +274,12 @@ def family(metric: Metric[T], reduction: Union[Reduction, dict[str, Reduction]])
     return MetricFamily(metric, reduction)
 
 
-def suite(collection: dict[str, MetricSuite[T]]) -> MetricSuite[T]:
-    """Creates a metric suite."""
-    return MultipleMetricFamilies(collection)
+def suite(collection: dict[str, MetricSuite[T]], max_workers: Optional[int] = None) -> MultipleMetricFamilies[T]:
+    """Creates a metric suite, optionally scoring its families concurrently on `max_workers` threads.
+
+    A threaded suite should be closed when it is no longer used, e.g. by using it as a context manager.
+    """
+    return MultipleMetricFamilies(collection, max_workers=max_workers)
 
 
 __all__ = [
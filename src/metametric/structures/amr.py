@@ -1,5 +1,6 @@
 """Abstract Meaning Representation (AMR) structure."""
 
+import sys
 from dataclasses import dataclass
 from typing import Union
 from collections.abc import Collection
@@ -17,6 +18,13 @@ class Prop:
     pred: str
     obj: Union[Variable, str]
 
+    def __post_init__(self):
+        """Interns the string fields so that equality checks between propositions short-circuit on identity."""
+        if type(self.pred) is str:
+            object.__setattr__(self, "pred", sys.intern(self.pred))
+        if type(self.obj) is str:
+            object.__setattr__(self, "obj", sys.intern(self.obj))
+
 
 @metametric()
 @dataclass
@@ -3,6 +3,7 @@
 The data structures defined here can automatically derive commonly used metrics in IE.
 """
 
+import sys
 from dataclasses import dataclass
 from collections.abc import Collection
 
@@ -26,6 +27,22 @@ class Mention:
     left: int
     right: int
 
+    def __post_init__(self):
+        """Caches the hash, as mentions are hashed whenever sets of them are matched."""
+        object.__setattr__(self, "_hash", hash((self.left, self.right)))
+
+    def __eq__(self, other: object) -> bool:
+        """Compares the spans field by field, without building tuples as the generated method does."""
+        if self is other:
+            return True
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.left == other.left and self.right == other.right  # type: ignore[attr-defined]
+
+    def __hash__(self) -> int:
+        """Returns the hash cached at construction."""
+        return self._hash  # type: ignore[attr-defined]
+
 
 @metametric()
 @dataclass
@@ -44,6 +61,11 @@ class Relation:
     subj: Mention
     obj: Mention
 
+    def __post_init__(self):
+        """Interns the type so that equality checks between relations short-circuit on identity."""
+        if type(self.type) is str:
+            self.type = sys.intern(self.type)
+
 
 @metametric()
 @dataclass
@@ -58,6 +80,11 @@ class Trigger:
     mention: Mention
     type: str
 
+    def __post_init__(self):
+        """Interns the type so that equality checks between triggers short-circuit on identity."""
+        if type(self.type) is str:
+            self.type = sys.intern(self.type)
+
 
 @metametric()
 @dataclass
@@ -73,6 +100,11 @@ class Argument:
     mention: Mention
     role: str
 
+    def __post_init__(self):
+        """Interns the role so that equality checks between arguments short-circuit on identity."""
+        if type(self.role) is str:
+            self.role = sys.intern(self.role)
+
 
 @metametric()
 @dataclass
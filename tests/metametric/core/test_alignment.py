@@ -1,6 +1,17 @@
 """Tests for metrics derived with alignments."""
 
+import itertools
+from typing import Any, Union
+
+import networkx as nx
+import numpy as np
+from pytest import approx, raises
+
 import metametric.dsl as mm
+from metametric.core.constraint import MatchingConstraint
+from metametric.core.matching_metrics import SequenceMatchingMetric, SetMatchingMetric
+from metametric.core.metric import UnionMetric
+from metametric.structures.ie import Mention, Relation
 
 
 def test_solve_alignment():
@@ -52,3 +63,167 @@ def test_solve_alignment():
     assert m1.score(c, c) == 1
     assert mm.set_matching[int, "<-", "none"](...).score(c, c) == 1
     assert mm.set_matching[int, "~", "none"](...).score(c, c) == 1
+
+
+def test_discrete_set_matching():
+    """Test that the discrete set matching fast paths agree with the general solver."""
+    a = [1, 2, 2, 3, 3, 3]
+    b = [2, 3, 3, 4]
+    for constraint in ["<-", "->", "~"]:
+        fast = mm.set_matching[int, constraint, "none"](...)
+        slow = mm.set_matching[int, constraint, "none"](mm.from_func(lambda x, y: float(x == y)))
+        assert fast.score(a, b) == slow.score(a, b)
+        assert fast.score(b, a) == slow.score(b, a)
+        assert fast.score_self(a) == slow.score_self(a)
+
+
+def test_equality_dataclass_set_matching():
+    """Test that dataclasses whose fields are all compared by equality take the discrete fast paths correctly."""
+
+    def rel(t, i, j):
+        return Relation(type=t, subj=Mention(i, i + 1), obj=Mention(j, j + 1))
+
+    a = [rel("born-in", 0, 1), rel("works-for", 0, 2), rel("born-in", 3, 4), rel("lives-in", 0, 1)]
+    b = [rel("born-in", 0, 1), rel("works-for", 0, 3), rel("lives-in", 0, 1), rel("born-in", 3, 4)]
+    for constraint in ["<->", "<-", "->", "~"]:
+        fast = mm.set_matching[Relation, constraint, "none"](...)
+        slow = mm.set_matching[Relation, constraint, "none"](mm.from_func(lambda x, y: float(x == y)))
+        assert fast.score(a, b) == slow.score(a, b) == 3.0
+        assert fast.score_self(a) == slow.score_self(a)
+    equal = mm.from_func(lambda x, y: float(x == y))
+    assert (mm.auto[Relation].gram_matrix(a, b) == equal.gram_matrix(a, b)).all()
+
+    # duplicate elements are matched to as many equal copies as the other side has
+    a, b = a + [a[0], a[0]], b + [b[0]]
+    for constraint in ["<->", "<-", "->", "~"]:
+        fast = mm.set_matching[Relation, constraint, "none"](...)
+        slow = mm.set_matching[Relation, constraint, "none"](mm.from_func(lambda x, y: float(x == y)))
+        assert fast.score(a, b) == slow.score(a, b)
+        assert fast.score(a, a) == slow.score(a, a)
+        assert fast.score_self(a) == slow.score_self(a)
+        assert fast.score_triplet(a, b) == slow.score_triplet(a, b)
+    assert mm.set_matching[Relation, "<->", "none"](...).score(a, b) == 4.0
+
+    family = mm.family(mm.set_matching[Relation, "<->", "none"](...), mm.micro_average(["f1"]))
+    agg = family.new()
+    agg.update_batch([[a[0], a[0]]], [[a[0], a[0]]])
+    assert agg.compute()["f1"] == approx(1.0)
+
+
+def _reference_sequence_score(m, constraint):
+    """The original dynamic program for sequence matching, with the constraint checked at every cell."""
+    f = np.zeros([m.shape[0] + 1, m.shape[1] + 1])
+    for i in range(1, m.shape[0] + 1):
+        for j in range(1, m.shape[1] + 1):
+            f[i, j] = max(f[i - 1, j - 1] + m[i - 1, j - 1], f[i - 1, j], f[i, j - 1])
+            if constraint in (MatchingConstraint.ONE_TO_MANY, MatchingConstraint.MANY_TO_MANY):
+                f[i, j] = max(f[i, j], f[i, j - 1] + m[i - 1, j - 1])
+            if constraint in (MatchingConstraint.MANY_TO_ONE, MatchingConstraint.MANY_TO_MANY):
+                f[i, j] = max(f[i, j], f[i - 1, j] + m[i - 1, j - 1])
+    return f[-1, -1].item()
+
+
+def test_sequence_matching():
+    """Test the sequence matching kernels against the reference dynamic program."""
+    rng = np.random.default_rng(0)
+    a = rng.integers(0, 4, size=7).tolist()
+    b = rng.integers(0, 4, size=9).tolist()
+    for constraint in MatchingConstraint:
+        metric = mm.sequence_matching[int, constraint, "none"](...)
+        m = mm.auto[int].gram_matrix(a, b)
+        assert metric.score(a, b) == approx(_reference_sequence_score(m, constraint))
+        assert metric.score(a, []) == 0
+        assert metric.score_self(a) == approx(metric.score(a, a))
+        single = SequenceMatchingMetric(mm.auto[int], constraint, dtype=np.float32)
+        assert single.score(a, b) == metric.score(a, b)
+    with raises(ValueError):
+        SequenceMatchingMetric(mm.auto[int], dtype=np.int64)
+
+
+def test_gram_matrix_self():
+    """Test that self Gram matrices agree with the general Gram matrix, for symmetric and asymmetric metrics."""
+
+    def mod3(x: int) -> int:
+        return x % 3
+
+    def excess(x: int, y: int) -> float:
+        return max(x - y, 0) + 1.0
+
+    xs = [3, 1, 4, 1, 5]
+    ys = [1, 5, 9]
+    for metric in [mm.auto[int], mm.preprocess(mod3, mm.auto[int]), mm.from_func(excess)]:
+        assert np.array_equal(metric.gram_matrix_self(xs), metric.gram_matrix(xs, list(xs)))
+        expected = [[metric.score(x, y) for y in ys] for x in xs]
+        assert np.array_equal(metric.gram_matrix(xs, ys), expected)
+
+    # the diagonal is scored as a pair even where self scores are defined differently, as for unions
+    def add(x: int, y: int) -> float:
+        return float(x + y)
+
+    union = UnionMetric(Union[int, str], {int: mm.from_func(add), str: mm.auto[str]})  # type: ignore[arg-type]
+    zs = [1, 2, "a"]
+    assert np.array_equal(union.gram_matrix(zs, zs), union.gram_matrix(zs, list(zs)))
+    m = SetMatchingMetric(union, "~")
+    assert m.score(zs, zs) == m.score(zs, list(zs)) == m.score_self(zs) == 13.0
+
+
+def test_many_to_many_matching_skips_zero_pairs():
+    """Test that many-to-many matchings only report the pairs with a nonzero score, while scoring every pair."""
+    metric = mm.set_matching[int, "~", "none"](mm.from_func(lambda x, y: float(x == y) / 2))
+    xs, ys = [1, 2, 2], [2, 3]
+    total, matching = metric.compute(xs, ys)
+    assert total == 1.0
+    matches = []
+    hooks = {"[*]": mm.Hook.from_callable(lambda i, pp, p, rp, r, s: matches.append((p, r, s)))}
+    matching.run_with_hooks(hooks)
+    assert matches == [(2, 2, 0.5), (2, 2, 0.5)]
+
+
+def _brute_force_graph_score(x, y, inner, constraint):
+    """The best score over all matchings of the nodes of two graphs that preserve reachability, by enumeration."""
+    x_nodes, y_nodes = list(x.nodes()), list(y.nodes())
+    x_reach = {(u0, u1): nx.has_path(x, u0, u1) for u0 in x_nodes for u1 in x_nodes}
+    y_reach = {(v0, v1): nx.has_path(y, v0, v1) for v0 in y_nodes for v1 in y_nodes}
+    pairs = [(u, v, s) for u in x_nodes for v in y_nodes if (s := inner.score(u, v)) > 0]
+    x_unique = constraint in (MatchingConstraint.ONE_TO_ONE, MatchingConstraint.MANY_TO_ONE)
+    y_unique = constraint in (MatchingConstraint.ONE_TO_ONE, MatchingConstraint.ONE_TO_MANY)
+    best = 0.0
+    for k in range(len(pairs) + 1):
+        for matching in itertools.combinations(pairs, k):
+            us, vs = [u for u, _, _ in matching], [v for _, v, _ in matching]
+            if (x_unique and len(set(us)) < k) or (y_unique and len(set(vs)) < k):
+                continue
+            if all(x_reach[u0, u1] == y_reach[v0, v1] for u0, v0, _ in matching for u1, v1, _ in matching):
+                best = max(best, sum(s for _, _, s in matching))
+    return best
+
+
+def _random_dag(rng, n, p):
+    g = nx.DiGraph()
+    g.add_nodes_from(range(n))
+    g.add_edges_from((i, j) for i in range(n) for j in range(i + 1, n) if rng.random() < p)
+    return g
+
+
+def test_graph_matching():
+    """Test graph matching against enumerating all reachability preserving matchings, also after changing a graph."""
+
+    def near(x: int, y: int) -> float:
+        return 1.0 / (1 + abs(x - y)) if abs(x - y) <= 1 else 0.0
+
+    inner = mm.from_func(near)
+    rng = np.random.default_rng(0)
+    for constraint in MatchingConstraint:
+        # networkx graphs are only checked against the `Graph` protocol at runtime
+        metric: mm.Metric[Any] = mm.graph_matching[int, constraint, "none"](inner)
+        for _ in range(3):
+            x, y = _random_dag(rng, 4, 0.5), _random_dag(rng, 4, 0.5)
+            assert metric.score(x, y) == approx(_brute_force_graph_score(x, y, inner, constraint))
+            assert metric.score_self(x) == approx(metric.score(x, x))
+            assert metric.score_self(x) == approx(_brute_force_graph_score(x, x, inner, constraint))
+
+            # the same graph objects are scored again after being changed
+            x.add_edges_from([(0, 3), (1, 2)])
+            y.remove_edges_from(list(y.edges())[:2])
+            assert metric.score(x, y) == approx(_brute_force_graph_score(x, y, inner, constraint))
+            assert metric.score_self(x) == approx(_brute_force_graph_score(x, x, inner, constraint))
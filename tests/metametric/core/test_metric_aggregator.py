@@ -1,8 +1,34 @@
 """Tests for metric aggregators."""
 
-from pytest import approx
+import pickle
+import threading
+from collections.abc import Collection
+from dataclasses import dataclass
+
+from pytest import approx, raises
 
 import metametric.dsl as mm
+from metametric.core.decorator import metametric
+from metametric.structures.ie import Mention, Relation, RelationSet
+
+
+class CountingMetric(mm.Metric[tuple]):
+    """Scores tuples by the size of their intersection, recording every object it self-scores in `calls`."""
+
+    def __init__(self, deterministic: bool = True):
+        self.calls: list[tuple] = []
+        self._deterministic = deterministic
+
+    def compute(self, x, y):
+        return float(len(set(x) & set(y))), mm.Matching([])
+
+    def score_self(self, x):
+        self.calls.append(x)
+        return float(len(set(x)))
+
+    @property
+    def deterministic(self):
+        return self._deterministic
 
 
 def test_metric_aggregator():
@@ -31,3 +57,150 @@ def test_metric_aggregator():
     assert metrics["macro-f1"] == approx(0.71, abs=0.01)
     assert metrics["macro-f0.5"] == approx(0.86, abs=0.01)
     assert metrics["macro-f2"] == approx(0.61, abs=0.01)
+
+
+def test_zero_denominators_raise():
+    """Macro- and micro-averaging both raise on a zero denominator, as normalized metrics do."""
+    zero = mm.from_func(lambda x, y: 0.0)  # every object scores 0 against itself
+    with raises(ZeroDivisionError):
+        mm.normalize["precision"](zero).score(1, 2)
+    for reduction in [mm.macro_average, mm.micro_average]:
+        for normalizer in ["precision", "recall", "jaccard"]:
+            agg = mm.family(zero, reduction([normalizer])).new()
+            agg.update_batch([1, 2], [1, 3])
+            with raises(ZeroDivisionError):
+                agg.compute()
+        agg = mm.family(zero, reduction(["f1"])).new()
+        agg.update_batch([1, 2], [1, 3])
+        assert agg.compute()["f1"] == 0.0
+
+
+def test_macro_average_of_no_pairs_raises():
+    """Macro-averaging over no pairs raises instead of returning NaN."""
+    agg = mm.family(mm.auto[int], mm.macro_average(["f1", "none"])).new()
+    with raises(ZeroDivisionError):
+        agg.compute()
+
+
+def test_batched_self_scores_are_shared():
+    """A reference scored against several predictions in a batch has its self score computed once."""
+    metric = CountingMetric()
+    ref = (1, 2, 3)
+    agg = mm.family(metric, mm.micro_average(["f1"])).new()
+    agg.update_batch([(1,), (1, 2), (4,)], [ref, ref, ref])
+    assert metric.calls.count(ref) == 1
+    assert agg.compute()["f1"] == approx(2 * 3 / (4 + 9))
+
+
+def test_self_scores_are_not_reused_across_updates():
+    """An object changed between updates is self-scored again."""
+
+    def rel(i, j):
+        return Relation(type="r", subj=Mention(i, i + 1), obj=Mention(j, j + 1))
+
+    pred = RelationSet(relations=[rel(0, 1), rel(2, 3)])
+    ref = RelationSet(relations=[rel(0, 1), rel(2, 3)])
+    for update in ["update_single", "update_batch"]:
+        agg = mm.family(mm.auto[RelationSet], mm.micro_average(["precision"])).new()
+        for _ in range(2):
+            if update == "update_single":
+                agg.update_single(pred, ref)
+            else:
+                agg.update_batch([pred], [ref])
+            pred.relations = [rel(0, 1)]
+        pred.relations = [rel(0, 1), rel(2, 3)]
+        assert agg.compute()["precision"] == approx(1.0)
+
+
+def test_self_scores_of_nondeterministic_metrics_are_not_cached():
+    """Metrics that are not deterministic have their self scores recomputed for every pair."""
+    metric = CountingMetric(deterministic=False)
+    ref = (1, 2, 3)
+    agg = mm.family(metric, mm.micro_average(["f1"])).new()
+    agg.update_batch([(1,), (1, 2), (4,)], [ref, ref, ref])
+    agg.reset()
+    agg.update_single((1,), ref)
+    assert metric.calls.count(ref) == 4
+
+
+def test_batch_update_matches_single_updates():
+    """Batched scoring gives the same metrics as updating pair by pair."""
+    preds = ["a", "b", "c", "d"]
+    refs = ["a", "x", "c", "y"]
+    for m in [mm.DiscreteMetric(str), mm.DiscreteMetric(str).contramap(str.upper)]:
+        family = mm.family(m, mm.macro_average(["f1"]))
+        single, batch = family.new(), family.new()
+        for p, r in zip(preds, refs):
+            single.update_single(p, r)
+        batch.update_batch(preds, refs)
+        assert batch.compute() == single.compute() == {"f1": approx(0.5)}
+
+
+def test_composite_metrics_inherit_nondeterminism():
+    """Metrics composed of a non-deterministic metric are not deterministic, and do not share self scores."""
+    inner = CountingMetric(deterministic=False)
+    for metric in [
+        mm.normalize["f1"](inner),
+        mm.preprocess(tuple, inner),
+        mm.set_matching[tuple, "<->", "none"](inner),
+        mm.sequence_matching[tuple, "<->", "none"](inner),
+    ]:
+        assert not metric.deterministic
+    ref = (1, 2, 3)
+    agg = mm.family(mm.normalize["f1"](inner), mm.macro_average(["none"])).new()
+    agg.update_batch([(1,), (1, 2), ref], [ref, ref, ref])
+    assert inner.calls.count(ref) == 4
+
+
+def test_threaded_suite_matches_serial_suite():
+    """Scoring the families of a suite on a thread pool gives the same metrics as scoring them in turn."""
+    a = [[0, 1], [2], [1, 2]]
+    b = [[0, 1, 2, 3], [2, 3], [1, 2, 3]]
+    families: dict[str, mm.MetricSuite[Collection[int]]] = {
+        "one-to-one": mm.family(mm.set_matching[int, "<->", "none"](...), mm.micro_average(["f1"])),
+        "many-to-many": mm.family(mm.set_matching[int, "~", "none"](...), mm.macro_average(["f1"])),
+    }
+    expected = mm.suite(families).new()
+    expected.update_batch(a, b)
+    n_threads = threading.active_count()
+    with mm.suite(families, max_workers=2) as threaded_suite:
+        # the pool is only started by the first batch, and shared by every aggregator of the suite
+        aggs = [threaded_suite.new() for _ in range(5)]
+        assert threading.active_count() == n_threads
+        for agg in aggs:
+            agg.update_batch(a, b)
+            assert agg.compute() == expected.compute()
+        assert threading.active_count() <= n_threads + 2
+        pickle.loads(pickle.dumps(threaded_suite))
+    assert threading.active_count() == n_threads
+
+    # a closed suite starts its pool again when it is used
+    aggs[0].update_batch(a, b)
+    threaded_suite.close()
+    assert threading.active_count() == n_threads
+
+
+@metametric()
+@dataclass(frozen=True)
+class _Tagged:
+    tags: Collection[str]
+
+
+def test_dataclass_self_scores_count_matched_duplicates():
+    """A dataclass is self-scored as the score against itself, where duplicates of a one-to-one field match once."""
+    x, y = _Tagged(tags=["a", "a", "b"]), _Tagged(tags=["a", "b", "c"])
+    metric = mm.auto[_Tagged]
+    assert metric.score_self(x) == metric.score(x, x) == 2.0
+    agg = mm.family(metric, mm.micro_average(["f1"])).new()
+    agg.update_single(x, y)
+    assert agg.compute()["f1"] == approx(0.8)
+
+
+def test_normalized_metrics_share_batched_self_scores():
+    """Batched scoring through a normalized metric computes the self score of a repeated object once."""
+    metric = CountingMetric()
+    ref = (1, 2, 3)
+    agg = mm.family(mm.normalize["f1"](metric), mm.macro_average(["none"])).new()
+    agg.update_batch([(1,), (1, 2), ref], [ref, ref, ref])
+    assert metric.calls.count(ref) == 1
+    assert agg.compute()[""] == approx((2 * 1 / 4 + 2 * 2 / 5 + 1.0) / 3)